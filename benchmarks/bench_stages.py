@@ -0,0 +1,266 @@
+"""Measures the CPU-bound stages of producing an export, on synthetic
+submissions generated locally (no network access needed): decrypting the
+submissions, flattening the answers into CSV rows, writing, verifying,
+compressing, and reading back the export.
+
+Usage: python benchmarks/bench_stages.py [--responses N] [--fields N]
+
+The submissions are encrypted the same way as FormSG does (a NaCl box
+between a one-off submission keypair and the form's keypair), using a fixed
+form keypair whose secret key has the 44-character format expected by the
+GUI. The decryption stage requires the optional `PyNaCl` package, and is
+skipped if it is not installed.
+
+For each stage, reports the time taken, the throughput, the peak memory, and
+the net number of memory blocks allocated (the latter two measured in a
+separate run with `tracemalloc`, which slows the code down).
+"""
+import argparse
+import base64
+import csv
+import datetime as dt
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import nacl.public
+    import nacl.utils
+except ImportError:
+    nacl = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formsgdownloader import compression, csv_utils, reader, verify
+
+
+# Fixed form keypair, so that runs are comparable
+FORM_SECRET_KEY = base64.b64encode(bytes(range(32))).decode('ascii')
+FIELD_TYPES = ('textfield', 'textarea', 'checkbox', 'table')
+WORDS = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do'.split()
+
+
+def generate_submissions(num_responses, num_fields, seed=0):
+    """Generates plaintext submissions, each being a list of answers in the
+    format of FormSG's decrypted submissions.
+    """
+
+    rng = random.Random(seed)
+    start = dt.datetime(2021, 1, 1)
+    submissions = []
+    for i in range(num_responses):
+        answers = []
+        for j in range(num_fields):
+            field_type = FIELD_TYPES[j % len(FIELD_TYPES)]
+            answer = {'_id': f'{j:024x}', 'question': f'Question {j}',
+                      'fieldType': field_type}
+            if field_type == 'textfield':
+                answer['answer'] = ' '.join(rng.choices(WORDS, k=3))
+            elif field_type == 'textarea':
+                answer['answer'] = '\n'.join(' '.join(rng.choices(WORDS, k=8))
+                                             for _ in range(rng.randint(1, 3)))
+            elif field_type == 'checkbox':
+                answer['answerArray'] = rng.sample(WORDS, k=rng.randint(1, 3))
+            else:
+                answer['answerArray'] = [rng.choices(WORDS, k=3)
+                                         for _ in range(rng.randint(1, 3))]
+            answers.append(answer)
+        submissions.append({
+            'id': f'{i:024x}',
+            'created': (start + dt.timedelta(minutes=i)).strftime('%d %b %Y, %I:%M:%S %p'),
+            'answers': answers,
+        })
+    return submissions
+
+
+def encrypt_submissions(submissions):
+    """Encrypts the answers of each submission to the form's public key, in
+    the format "<submission public key>;<nonce>:<ciphertext>" (each base64
+    encoded).
+    """
+
+    form_public_key = nacl.public.PrivateKey(
+        base64.b64decode(FORM_SECRET_KEY)).public_key
+    encrypted = []
+    for submission in submissions:
+        submission_key = nacl.public.PrivateKey.generate()
+        box = nacl.public.Box(submission_key, form_public_key)
+        nonce = nacl.utils.random(nacl.public.Box.NONCE_SIZE)
+        ciphertext = box.encrypt(
+            json.dumps(submission['answers']).encode('utf-8'), nonce).ciphertext
+        encrypted.append({
+            'id': submission['id'],
+            'created': submission['created'],
+            'encryptedContent': '{};{}:{}'.format(
+                *(base64.b64encode(part).decode('ascii') for part in
+                  (bytes(submission_key.public_key), nonce, ciphertext))),
+        })
+    return encrypted
+
+
+def decrypt_submissions(encrypted):
+
+    form_secret_key = nacl.public.PrivateKey(base64.b64decode(FORM_SECRET_KEY))
+    submissions = []
+    for submission in encrypted:
+        submission_public_key, nonce_and_ciphertext = \
+            submission['encryptedContent'].split(';')
+        nonce, ciphertext = nonce_and_ciphertext.split(':')
+        box = nacl.public.Box(form_secret_key, nacl.public.PublicKey(
+            base64.b64decode(submission_public_key)))
+        plaintext = box.decrypt(base64.b64decode(ciphertext), base64.b64decode(nonce))
+        submissions.append({'id': submission['id'],
+                            'created': submission['created'],
+                            'answers': json.loads(plaintext)})
+    return submissions
+
+
+def flatten_submissions(submissions):
+    """Flattens each submission into a CSV row, with multiple answers
+    separated by ";" and the cells of each table row separated by ",".
+    """
+
+    header = [csv_utils.RESPONSE_ID_COLUMN, csv_utils.TIMESTAMP_COLUMN] + \
+        [answer['question'] for answer in submissions[0]['answers']]
+    rows = []
+    for submission in submissions:
+        row = [submission['id'], submission['created']]
+        for answer in submission['answers']:
+            if 'answer' in answer:
+                row.append(answer['answer'])
+            elif answer['fieldType'] == 'table':
+                row.append(';'.join(','.join(cells) for cells in answer['answerArray']))
+            else:
+                row.append(';'.join(answer['answerArray']))
+        rows.append(row)
+    return header, rows
+
+
+def write_export(file_path, header, rows):
+
+    preamble = [['Expected total responses', str(len(rows))], []]
+    csv_utils.write_export(file_path, preamble, header, rows)
+    return file_path
+
+
+def run_stages(num_responses, num_fields, work_dir):
+    """Yields the name, the function to benchmark, the number of bytes
+    processed (`None` for the size of the export), and the function to call
+    before each run of the benchmarked function (or `None`), for each stage.
+    """
+
+    submissions = generate_submissions(num_responses, num_fields)
+    if nacl is not None:
+        encrypted = encrypt_submissions(submissions)
+        num_bytes = sum(len(s['encryptedContent']) for s in encrypted)
+        yield 'decrypt', lambda: decrypt_submissions(encrypted), num_bytes, None
+    else:
+        print('[!] PyNaCl is not installed, skipping the "decrypt" stage')
+
+    num_bytes = len(json.dumps([s['answers'] for s in submissions]))
+    yield 'flatten', lambda: flatten_submissions(submissions), num_bytes, None
+
+    header, rows = flatten_submissions(submissions)
+    export_path = os.path.join(work_dir, 'export.csv')
+    yield 'write', lambda: write_export(export_path, header, rows), None, None
+    yield 'verify', lambda: verify.verify_export(export_path, num_responses), None, None
+    yield 'read (csv module)', lambda: _read_with_csv(export_path), None, None
+    yield 'read', lambda: _read_with_reader(export_path, header), None, None
+
+    for codec in compression.CODECS:
+        try:
+            compression.check_codec(codec)
+        except ImportError:
+            print(f'[!] Skipping the "compress ({codec})" stage: the codec is '
+                  'not available')
+            continue
+        # The export is compressed in place, so compress a fresh copy each run
+        copy_path = os.path.join(work_dir, f'export-{codec}.csv')
+        yield (f'compress ({codec})',
+               lambda codec=codec, copy_path=copy_path:
+                   compression.compress_file(copy_path, codec),
+               None,
+               lambda copy_path=copy_path: shutil.copyfile(export_path, copy_path))
+
+
+def _read_with_csv(file_path):
+
+    with open(file_path, 'rt', encoding=csv_utils.ENCODING, newline='') as in_file:
+        for _ in csv.reader(in_file):
+            pass
+
+
+def _read_with_reader(file_path, header):
+
+    checkbox_columns = header[2 + FIELD_TYPES.index('checkbox')::len(FIELD_TYPES)]
+    table_columns = header[2 + FIELD_TYPES.index('table')::len(FIELD_TYPES)]
+    for _ in reader.iter_responses(file_path, list_columns=checkbox_columns,
+                                   table_columns=table_columns):
+        pass
+
+
+def measure(func, repeat, setup=None):
+    """Returns the best time (in seconds) of `repeat` runs of `func`, and the
+    peak memory (in bytes) and net number of blocks allocated by a separate
+    run under `tracemalloc`. If given, `setup` is called before each run,
+    outside of the measurements.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    return best, peak, blocks
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--responses', type=int, default=2000)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(args)
+
+    print(f'{args.responses} responses with {args.fields} fields each, best '
+          f'of {args.repeat} runs')
+    print(f'{"Stage":<18}{"Time (ms)":>10}{"MB/s":>10}{"Records/s":>12}'
+          f'{"Peak (MB)":>11}{"Blocks":>10}')
+
+    work_dir = tempfile.mkdtemp()
+    export_path = os.path.join(work_dir, 'export.csv')
+    try:
+        for name, func, num_bytes, setup in run_stages(args.responses, args.fields, work_dir):
+            best, peak, blocks = measure(func, args.repeat, setup)
+            if num_bytes is None: # Stages that process the export
+                num_bytes = os.path.getsize(export_path)
+            print(f'{name:<18}{best * 1000:>10.1f}{num_bytes / best / 1e6:>10.1f}'
+                  f'{args.responses / best:>12.0f}{peak / 1e6:>11.1f}{blocks:>10}')
+    finally:
+        shutil.rmtree(work_dir)
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Measures the import time of the GUI, i.e., the work done before the window
+appears, using `python -X importtime`.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--max-ms MS]
+
+Exits with a non-zero status if the GUI imports selenium at startup, or if
+the median import time exceeds `--max-ms`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+MODULE = 'formsgdownloader.gui'
+LAZY_MODULES = ('selenium', 'formsgdownloader.formsg_driver')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module=MODULE):
+    """Imports `module` in a fresh interpreter.
+
+    Returns:
+        tuple: A 2-tuple of the cumulative import time of `module` in
+            milliseconds, and the set of names of all modules imported.
+    """
+
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True, cwd=REPO_DIR)
+
+    cumulative_us, imported = None, set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+
+    return cumulative_us / 1000, imported
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args(args)
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed_ms, imported = measure_import()
+        timings.append(elapsed_ms)
+
+    median_ms = statistics.median(timings)
+    print(f'{MODULE}: median {median_ms:.1f} ms, min {min(timings):.1f} ms, '
+          f'max {max(timings):.1f} ms over {args.runs} runs')
+
+    eager_modules = [m for m in LAZY_MODULES if m in imported]
+    if eager_modules:
+        print(f'[!] Imported at startup: {", ".join(eager_modules)}')
+        return 1
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f'[!] Median import time exceeds {args.max_ms} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""This cli_utils module contains helper functions shared by the command line
+scripts (`formsg_driver` and `work_queue`). It does not import selenium, so
+that commands that do not download anything start without it.
+"""
+import datetime as dt
+import json
+
+
+def read_forms_file(file_path):
+    """Reads the forms from a session file (.formsg) or a credentials file
+    (.csv), as saved by the GUI.
+
+    Returns:
+        list of tuple: A list of 3-tuples, each representing the form name,
+            form ID, and form secret key.
+    """
+
+    with open(file_path, 'rt', encoding='utf-8') as in_file:
+        if file_path.endswith('.formsg'):
+            return [tuple(form) for form in json.load(in_file)['forms']]
+        return [tuple(line.strip().split(',')) for line in in_file if line.strip()]
+
+
+def add_shard_arguments(parser):
+    """Adds the command line options for splitting the export of each form
+    into date ranges (see `formsg_driver.download_csv()`) to the `argparse`
+    parser.
+    """
+
+    parser.add_argument('--shards', type=int, default=1,
+        help='Split the export of each form into this many date ranges, '
+             'for very large forms (requires --start-date)')
+    parser.add_argument('--start-date', type=dt.date.fromisoformat,
+        help='Date (YYYY-MM-DD) of the earliest response to download')
+    parser.add_argument('--end-date', type=dt.date.fromisoformat,
+        help='Date (YYYY-MM-DD) of the latest response to download '
+             '(default: today)')
+
+
+def check_shard_arguments(parser, args):
+
+    if args.shards < 1:
+        parser.error('--shards must be at least 1')
+    if args.shards > 1 and args.start_date is None:
+        parser.error('--start-date is required when --shards is more than 1')
@@ -0,0 +1,118 @@
+"""This compression module compresses finished exports as a stream, and opens
+exports for reading regardless of whether (and how) they are compressed.
+
+Supported codecs are "gzip" (built-in) and "zstd" (requires the optional
+`zstandard` package).
+"""
+import gzip
+import os
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODECS = ('gzip', 'zstd')
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+LEVEL_RANGES = {'gzip': (0, 9), 'zstd': (1, 22)}
+CHUNK_SIZE = 1024 * 1024
+
+
+def compress_file(file_path, codec, level=None, remove_source=True):
+    """Compresses the file at `file_path` as a stream into a file of the same
+    name with the codec's extension appended.
+
+    The output is deterministic (e.g., no timestamp in the gzip header), so
+    that unchanged exports compress to identical files.
+
+    Returns:
+        str: The path to the compressed file.
+    """
+
+    check_codec(codec, level)
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+    compressed_path = file_path + EXTENSIONS[codec]
+
+    try:
+        with open(file_path, 'rb') as in_file, \
+                open(compressed_path + '.tmp', 'wb') as raw_out_file:
+            if codec == 'gzip':
+                with gzip.GzipFile(filename='', mode='wb', fileobj=raw_out_file,
+                        compresslevel=level, mtime=0) as out_file:
+                    shutil.copyfileobj(in_file, out_file, CHUNK_SIZE)
+            else:
+                compressor = zstandard.ZstdCompressor(level=level)
+                compressor.copy_stream(in_file, raw_out_file,
+                    read_size=CHUNK_SIZE, write_size=CHUNK_SIZE)
+        os.replace(compressed_path + '.tmp', compressed_path)
+    except BaseException:
+        # Do not leave a partial file behind, e.g., if the disk is full
+        if os.path.exists(compressed_path + '.tmp'):
+            os.remove(compressed_path + '.tmp')
+        raise
+
+    if remove_source:
+        os.remove(file_path)
+
+    return compressed_path
+
+
+def open_export(file_path, mode='rt', **kwargs):
+    """Opens an export for reading, decompressing it as a stream if its
+    extension indicates that it is compressed.
+
+    Args:
+        file_path (str): The path to the export.
+        mode (str): Either "rt" or "rb".
+        **kwargs (various): Passed to the underlying `open()` function, e.g.,
+            `encoding` and `newline` in text mode.
+    """
+
+    codec = get_codec(file_path)
+    if codec is None:
+        return open(file_path, mode, **kwargs)
+
+    check_codec(codec)
+    if codec == 'gzip':
+        return gzip.open(file_path, mode, **kwargs)
+    return zstandard.open(file_path, mode, **kwargs)
+
+
+def get_codec(file_path):
+    """Returns the codec for the file at `file_path` based on its extension,
+    or `None` if the file is not compressed.
+    """
+
+    for codec, extension in EXTENSIONS.items():
+        if file_path.endswith(extension):
+            return codec
+    return None
+
+
+def available_codecs():
+    """Returns the codecs whose required packages are installed."""
+
+    return tuple(codec for codec in CODECS
+                 if codec != 'zstd' or zstandard is not None)
+
+
+def check_codec(codec, level=None):
+    """Raises an error if `codec` is not supported, if the package it
+    requires is not installed, or if `level` (if given) is not a valid
+    compression level for the codec.
+    """
+
+    if codec not in CODECS:
+        raise ValueError(f'Unsupported compression codec: {codec}. '
+            f'Supported codecs are: {", ".join(CODECS)}.')
+    if codec == 'zstd' and zstandard is None:
+        raise ImportError('The "zstandard" package is required for zstd '
+            'compression: python -m pip install zstandard')
+    min_level, max_level = LEVEL_RANGES[codec]
+    if level is not None and not min_level <= level <= max_level:
+        raise ValueError(f'Invalid compression level for {codec}: {level}. '
+            f'Levels range from {min_level} to {max_level}.')
@@ -0,0 +1,223 @@
+"""This csv_utils module contains helper functions for working with the CSV
+files exported from FormSG.
+
+A FormSG export starts with a short preamble of metadata rows (e.g., the
+expected number of responses), followed by the header row (starting with the
+"Response ID" column) and the responses themselves.
+"""
+import csv
+import datetime as dt
+import functools
+import os
+import shutil
+
+from formsgdownloader.compression import open_export
+
+
+ENCODING = 'utf-8-sig' # FormSG exports include a byte order mark
+EXPECTED_COUNT_PREAMBLE_KEY = 'Expected total responses'
+RESPONSE_ID_COLUMN = 'Response ID'
+TIMESTAMP_COLUMN = 'Timestamp'
+TIMESTAMP_FORMATS = [
+    '%d %b %Y, %I:%M:%S %p',
+    '%d %b %Y %I:%M:%S %p',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%d %H:%M:%S',
+]
+
+_MONTHS = {month: i for i, month in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+
+def read_export(file_path):
+    """Reads a FormSG export into memory.
+
+    Returns:
+        tuple: A 3-tuple of the preamble rows, the header row, and the
+            response rows, each row being a list of strings.
+    """
+
+    with open_export(file_path, 'rt', encoding=ENCODING, newline='') as in_file:
+        reader = csv.reader(in_file)
+        preamble, header = split_preamble(reader)
+        rows = list(reader)
+
+    return preamble, header, rows
+
+
+def split_preamble(reader):
+    """Consumes rows from the csv `reader` up to and including the header
+    row.
+
+    Returns:
+        tuple: A 2-tuple of the preamble rows and the header row. If no
+            header row is found, the first row is treated as the header.
+    """
+
+    preamble = []
+    for row in reader:
+        if row and row[0] == RESPONSE_ID_COLUMN:
+            return preamble, row
+        preamble.append(row)
+
+    # No "Response ID" column, fall back to the first row as header
+    return [], (preamble[0] if preamble else [])
+
+
+def write_export(file_path, preamble, header, rows):
+
+    with open(file_path, 'wt', encoding=ENCODING, newline='') as out_file:
+        writer = csv.writer(out_file, quoting=csv.QUOTE_ALL)
+        writer.writerows(preamble)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def merge_exports(file_paths, out_path):
+    """Merges several exports of the same form, each covering a consecutive
+    date range (in order), into a single file at `out_path`, sorted by
+    timestamp and with duplicate responses removed.
+
+    The exports are streamed into the merged file one after another, so only
+    the responses of one export (to sort them) and the IDs of the responses
+    seen so far are held in memory. The preamble is taken from the first
+    export, with the expected number of responses set to the sum of the
+    expected numbers in the exports, less the duplicates removed, so that
+    responses missing from an export are still detected when verifying the
+    merged file. If an export has no expected number, the number of
+    responses written is used instead.
+
+    Returns:
+        int: The number of responses written.
+    """
+
+    merged_preamble, merged_header, seen_ids, count = None, None, set(), 0
+    expected_count, duplicates = 0, 0
+    rows_path = out_path + '.rows'
+    try:
+        with open(rows_path, 'wt', encoding='utf-8', newline='') as rows_file:
+            writer = csv.writer(rows_file, quoting=csv.QUOTE_ALL)
+            for file_path in file_paths:
+                with open_export(file_path, 'rt', encoding=ENCODING, newline='') as in_file:
+                    reader = csv.reader(in_file)
+                    preamble, header = split_preamble(reader)
+                    if merged_header is None:
+                        merged_preamble, merged_header = preamble, header
+                    elif header != merged_header:
+                        raise ValueError(f'Header of "{file_path}" does not '
+                            'match the header of the other exports.')
+                    if expected_count is not None:
+                        preamble_count = get_expected_count(preamble)
+                        expected_count = None if preamble_count is None \
+                            else expected_count + preamble_count
+                    rows = sorted(reader, key=_timestamp_sort_key(header))
+
+                id_index = header.index(RESPONSE_ID_COLUMN) \
+                    if RESPONSE_ID_COLUMN in header else None
+                for row in rows:
+                    if id_index is not None:
+                        response_id = row[id_index] if id_index < len(row) else None
+                        if response_id in seen_ids:
+                            duplicates += 1
+                            continue
+                        seen_ids.add(response_id)
+                    writer.writerow(row)
+                    count += 1
+
+        with open(out_path, 'wt', encoding=ENCODING, newline='') as out_file:
+            writer = csv.writer(out_file, quoting=csv.QUOTE_ALL)
+            writer.writerows(_set_expected_count(merged_preamble or [],
+                count if expected_count is None else expected_count - duplicates))
+            writer.writerow(merged_header or [])
+            with open(rows_path, 'rt', encoding='utf-8', newline='') as rows_file:
+                shutil.copyfileobj(rows_file, out_file)
+    finally:
+        if os.path.exists(rows_path):
+            os.remove(rows_path)
+
+    return count
+
+
+def get_expected_count(preamble):
+    """Returns the expected number of responses in the preamble of an export,
+    or `None` if it is not given.
+    """
+
+    for row in preamble:
+        if len(row) == 2 and row[0] == EXPECTED_COUNT_PREAMBLE_KEY and row[1].isdigit():
+            return int(row[1])
+    return None
+
+
+def parse_timestamp(value):
+    """Parses a timestamp from a FormSG export, returning `None` if the
+    format is not recognized.
+    """
+
+    try:
+        return _parse_formsg_timestamp(value)
+    except (ValueError, KeyError):
+        pass
+
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return dt.datetime.strptime(value, timestamp_format)
+        except ValueError:
+            pass
+    return None
+
+
+# Helper functions
+
+def _parse_formsg_timestamp(value):
+    """Parses a timestamp in FormSG's format, e.g., "01 Jan 2021, 10:00:00
+    am" (with or without the comma), several times faster than
+    `datetime.strptime()`.
+    """
+
+    date_part, clock, meridiem = value.rsplit(' ', 2)
+    return dt.datetime(*_parse_date(date_part), *_parse_clock(clock, meridiem))
+
+
+# Exports have many responses on the same day, and at most 86,400 distinct
+#   times of day, so the parsed parts are cached
+@functools.lru_cache(maxsize=4096)
+def _parse_date(date_part):
+
+    day, month, year = date_part.rstrip(',').split(' ')
+    return int(year), _MONTHS[month], int(day)
+
+
+@functools.lru_cache(maxsize=2 ** 18)
+def _parse_clock(clock, meridiem):
+
+    meridiem = meridiem.lower()
+    if meridiem not in ('am', 'pm'):
+        raise ValueError(f'Unknown meridiem: {meridiem}')
+    hour, minute, second = clock.split(':')
+    hour = int(hour) % 12 + (12 if meridiem == 'pm' else 0)
+    return hour, int(minute), int(second)
+
+
+def _set_expected_count(preamble, count):
+
+    return [[row[0], str(count)] if len(row) == 2 and row[0] == EXPECTED_COUNT_PREAMBLE_KEY
+            else row for row in preamble]
+
+
+def _timestamp_sort_key(header):
+
+    if TIMESTAMP_COLUMN not in header:
+        return lambda row: 0
+
+    timestamp_index = header.index(TIMESTAMP_COLUMN)
+
+    def sort_key(row):
+        value = row[timestamp_index] if timestamp_index < len(row) else ''
+        timestamp = parse_timestamp(value)
+        # Unparseable timestamps are sorted last, by their raw value
+        return (timestamp is None, timestamp or dt.datetime.min, value)
+
+    return sort_key
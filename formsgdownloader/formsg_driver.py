@@ -16,13 +16,23 @@ Note: Functions starting with an underscore are meant to be internal
     directly.
 
 """
+import argparse
+import base64
 import datetime as dt
+import json
+import math
 import os
+import re
+import threading
 import time
+from collections import namedtuple
+
+from formsgdownloader import cli_utils, compression, csv_utils, metrics, output_store, verify
 
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, \
+    StaleElementReferenceException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -30,6 +40,40 @@ from selenium.webdriver.support import expected_conditions as EC
 
 FORMS = {}
 IS_INIT = False
+DOWNLOAD_DIR = None
+STORE_DIR = None
+METRICS_DIR = None
+COMPRESSION = None
+COMPRESSION_LEVEL = None
+METRICS = metrics.Metrics()
+RUN_START = time.time() # Reset when the browser is (re)initialized
+
+# Export timeouts, adapted to the number of responses and the throughput
+#   (responses per second) observed in previous exports of the form
+THROUGHPUT = {} # Mapping of form code (or '*' for all forms) to throughput
+THROUGHPUT_PATH = None
+DEFAULT_THROUGHPUT = 50
+EXPORT_TIMEOUT_SECONDS = 300 # When the number of responses is unknown
+MIN_EXPORT_TIMEOUT_SECONDS = 30
+MAX_EXPORT_TIMEOUT_SECONDS = 2 * 60 * 60
+EXPORT_TIMEOUT_FACTOR = 3 # Allowance for exports slower than usual
+STALL_SECONDS = 120 # Once the file has started downloading
+
+# Header of the last verified export of each form, which the next export of
+#   the form is verified against
+SCHEMAS = {} # Mapping of form code to list of columns
+SCHEMAS_PATH = None
+
+PreflightResult = namedtuple('PreflightResult', 'form_code ok details')
+
+# Unattended runs (e.g., the work queue workers) turn off the prompts, and
+#   may abort the download in progress from another thread
+INTERACTIVE = True
+ABORT = threading.Event()
+
+
+class DownloadAborted(Exception):
+    """Raised when the download in progress is aborted through `ABORT`."""
 
 # General Actions
 
@@ -44,6 +88,12 @@ def login(email):
 
 def enter_email(email):
 
+    with METRICS.timer('login_seconds', step='enter_email'):
+        _enter_email(email)
+
+
+def _enter_email(email):
+
     D.get('https://form.gov.sg/#!/signin')
     _type('//*[@id="email-input"]', email)
     _click('//*[@id="sign-in"]//button[contains(text(),"Get Started")]')
@@ -51,6 +101,12 @@ def enter_email(email):
 
 def enter_one_time_password(otp):
 
+    with METRICS.timer('login_seconds', step='enter_one_time_password'):
+        _enter_one_time_password(otp)
+
+
+def _enter_one_time_password(otp):
+
     _type('//*[@id="otp-input"]', otp)
     _click('//*[@id="sign-in"]//button[contains(text(),"Sign In")]')
     time.sleep(1)
@@ -59,36 +115,87 @@ def enter_one_time_password(otp):
     _wait_for_element_to_disappear('/html/body/div[1]/div/div/div/div[1]/div')
 
 
-def download_csv(form_code):
+def download_csv(form_code, shards=1, start_date=None, end_date=None):
+    """Downloads the responses of the form `form_code` as a CSV file.
+
+    Args:
+        form_code (str): The form to download the responses of.
+        shards (int): The number of date ranges to split the export into.
+            Each date range is exported separately (and so is subject to its
+            own timeout), after which the exports are merged into a single
+            file. Useful for very large forms.
+        start_date (datetime.date): The date of the earliest response to
+            download. Required if `shards` is more than 1.
+        end_date (datetime.date): The date of the latest response to
+            download. Defaults to today.
+    """
 
     print(f'[-->] Downloading data from form: {form_code}... ', end='')
     _init()
 
-    _go_to_form_admin(form_code)
-    _go_to_data_tab()
+    if start_date is None and shards > 1:
+        raise ValueError('start_date is required when splitting the export '
+            'into shards.')
+    if start_date is not None:
+        date_ranges = _split_date_range(
+            start_date, end_date or dt.date.today(), shards)
+    else:
+        date_ranges = [None]
+
+    step = 'open_form' # The step being performed, for the failure metrics
+    start = time.perf_counter()
     try:
+        _go_to_form_admin(form_code)
+        _go_to_data_tab()
+
+        step = 'unlock'
         _type('//*[@id="secretKeyInput"]', FORMS[form_code]['secret_key'], set_value_directly=True)
         _click('//button[.=" Unlock Responses "]')
-
-        # Set the date range to start from yesterday
-        # _click('//*[@id="date-picker"]/input')
-        # for _ in 'DD MMM YYYY':
-        #     _type('//div[@class="calendar left"]//input', Keys.BACKSPACE)
-        # yesterday = dt.date.today() - dt.timedelta(days=1)
-        # yesterday_string = dt.datetime.strftime(yesterday, '%d %b %Y')
-        # _type('//div[@class="calendar left"]//input', f'{yesterday_string}{Keys.ENTER}')
-
-        # for _ in 'DD MMM YYYY':
-        #     _type('//div[@class="calendar right"]//input', Keys.BACKSPACE)
-        # today_string = dt.datetime.strftime(dt.date.today(), '%d %b %Y')
-        # _type('//div[@class="calendar right"]//input', f'{today_string}{Keys.ENTER}{Keys.TAB}')
-
-        # _type('//*[@id="date-picker"]/input', Keys.ENTER)
-
-        _click('//*[@id="btn-export"]')
-        time.sleep(1)
-        _wait_for_element('//*[@id="btn-export"]/span[.="Export"]', 300) # Wait 5 minutes until download finishes, i.e., the "Export" button can be clicked again
+        response_count = _get_response_count()
+        # Only the full export is expected to match the count in the Data tab
+        expected_count = response_count if start_date is None else None
+        timeout = _get_export_timeout(form_code, response_count, len(date_ranges))
+
+        step = 'export'
+        shard_paths, shard_problems = [], []
+        export_seconds = 0
+        for date_range in date_ranges:
+            if date_range:
+                _set_date_range(*date_range)
+            export_start = time.perf_counter()
+            shard_path = _export_responses(timeout)
+            export_seconds += time.perf_counter() - export_start
+            shard_paths.append(shard_path)
+            if len(date_ranges) > 1:
+                # Each shard is checked against its own preamble, as missing
+                #   responses cannot be told apart from duplicates once merged
+                shard_result = verify.verify_export(shard_path)
+                shard_problems.extend(
+                    f'{problem} (responses from {date_range[0]} to {date_range[1]})'
+                    for problem in shard_result.problems)
+
+        step = 'merge'
+        if len(shard_paths) > 1:
+            export_path = _merge_shards(shard_paths)
+        else:
+            export_path = shard_paths[0]
+
+        step = 'verify'
+        result = verify.verify_export(export_path, expected_count,
+            SCHEMAS.get(form_code))
+        if shard_problems:
+            result = result._replace(ok=False,
+                problems=shard_problems + result.problems)
+        _record_schema(form_code, result.header)
+
+        step = 'finalize'
+        _record_throughput(form_code, result.responses, export_seconds)
+        _finalize_export(form_code, export_path, result.responses)
         print('OK')
+        if not result.ok:
+            METRICS.inc('verification_failures_total', form=form_code)
+            print(f'[!] Verification failed for form: {form_code}. '
+                  + ' '.join(f'{problem}.' for problem in result.problems))
 
     except NoSuchElementException as e:
         # Only catch the exception if the missing element is the secret key
@@ -96,7 +203,60 @@ def download_csv(form_code):
         if 'secretKeyInput' in str(e) and _is_element_visible('//*[@id="responses-tab"]//*[contains(text(),"No signs of movement")]'):
             print('No data')
         else:
+            METRICS.inc('failures_total', step=step)
             raise
+    except Exception:
+        METRICS.inc('failures_total', step=step)
+        raise
+    finally:
+        METRICS.observe('form_download_seconds', time.perf_counter() - start,
+            form=form_code)
+
+
+def preflight(form_codes):
+    """Checks that each form can be downloaded before starting the actual
+    download, i.e., that the form ID and secret key are well-formed, that the
+    form's admin page loads, and that the secret key unlocks the responses.
+
+    The checks run one form at a time, as the checks against FormSG go
+    through the single logged-in browser, and are skipped for forms that
+    fail the format checks. Each form thus takes about as long to check as
+    to open for download (a few seconds, or up to about 15 seconds if it
+    fails). Pre-flight does not make the run faster. It makes failures
+    show up before the downloads start, rather than partway through.
+
+    Returns:
+        list of PreflightResult: The result for each form, in the same order
+            as `form_codes`.
+    """
+
+    print('[*] Running pre-flight checks')
+    _init()
+    results = []
+    for form_code in form_codes:
+        result = _check_form_details(form_code)
+        if result.ok:
+            result = _check_form_access(form_code)
+        results.append(result)
+
+    _print_preflight_results(results)
+    return results
+
+
+def write_metrics(dir_path=None, file_name=metrics.FILE_NAME):
+    """Writes the metrics of the run so far into `dir_path` (defaults to the
+    metrics folder set in `_init()`), as `<file_name>.prom` and
+    `<file_name>.json`. Processes sharing a metrics folder (e.g., the work
+    queue workers) should each use a different `file_name`.
+    """
+
+    METRICS.set('run_seconds', time.time() - RUN_START)
+    METRICS.set('last_run_timestamp_seconds', time.time())
+    dir_path = dir_path or METRICS_DIR or DOWNLOAD_DIR
+    os.makedirs(dir_path, exist_ok=True)
+    paths = METRICS.write(dir_path, file_name)
+    print('[*] Metrics written to:', ', '.join(paths))
+    return paths
 
 
 def close():
@@ -126,33 +286,369 @@ def _go_to_data_tab():
     time.sleep(0.5)
 
 
-def _init(download_dir=None, binary_path=None, force=False):
+def _get_response_count():
+    """Returns the number of responses shown in the Data tab, or `None` if it
+    is not shown.
+    """
+
+    try:
+        elem = _wait_for_element('//*[@id="responses-tab"]//*[contains(text()," response")]', 1)
+    except NoSuchElementException:
+        return None
+
+    match = re.search(r'([\d,]+) responses?\b', elem.text)
+    return int(match.group(1).replace(',', '')) if match else None
+
+
+def _set_date_range(start_date, end_date):
+
+    _click('//*[@id="date-picker"]/input')
+    for _ in 'DD MMM YYYY':
+        _type('//div[@class="calendar left"]//input', Keys.BACKSPACE)
+    start_string = dt.datetime.strftime(start_date, '%d %b %Y')
+    _type('//div[@class="calendar left"]//input', f'{start_string}{Keys.ENTER}')
+
+    for _ in 'DD MMM YYYY':
+        _type('//div[@class="calendar right"]//input', Keys.BACKSPACE)
+    end_string = dt.datetime.strftime(end_date, '%d %b %Y')
+    _type('//div[@class="calendar right"]//input', f'{end_string}{Keys.ENTER}{Keys.TAB}')
+
+    _type('//*[@id="date-picker"]/input', Keys.ENTER)
+
+
+def _split_date_range(start_date, end_date, shards):
+    """Splits the inclusive date range into at most `shards` contiguous,
+    non-overlapping date ranges of roughly equal length.
+    """
+
+    if end_date < start_date:
+        raise ValueError(f'end_date ({end_date}) is before start_date '
+            f'({start_date}).')
+
+    num_days = (end_date - start_date).days + 1
+    shards = max(1, min(shards, num_days))
+    date_ranges = []
+    for i in range(shards):
+        shard_start = start_date + dt.timedelta(days=num_days * i // shards)
+        shard_end = start_date + dt.timedelta(days=num_days * (i + 1) // shards - 1)
+        date_ranges.append((shard_start, shard_end))
+    return date_ranges
+
+
+def _export_responses(timeout=EXPORT_TIMEOUT_SECONDS, stall_seconds=STALL_SECONDS):
+    """Clicks on the "Export" button and waits for the download to finish.
+
+    Returns:
+        str: The path to the downloaded file.
+    """
+
+    existing_files = set(os.listdir(DOWNLOAD_DIR))
+    _click('//*[@id="btn-export"]')
+    time.sleep(1)
+    _wait_for_export(existing_files, timeout, stall_seconds)
+    return _wait_for_download(existing_files)
+
+
+def _wait_for_export(existing_files, timeout, stall_seconds, poll_seconds=1):
+    """Waits until the export finishes, i.e., the "Export" button can be
+    clicked again.
+
+    Raises:
+        TimeoutException: If the export takes more than `timeout` seconds, or
+            if, once the file has started downloading, it makes no progress
+            for `stall_seconds` seconds. Progress is either a change in the
+            files being downloaded, or a change in the text of the "Export"
+            button (e.g., a progress indicator). Before the file starts
+            downloading (FormSG first decrypts the responses in the browser),
+            only `timeout` applies.
+    """
+
+    start = last_progress = time.monotonic()
+    last_button_text, last_state = None, None
+    while True:
+        try:
+            if any(elem.is_displayed() for elem in
+                   D.find_elements(By.XPATH, '//*[@id="btn-export"]/span[.="Export"]')):
+                return
+            buttons = D.find_elements(By.XPATH, '//*[@id="btn-export"]')
+            button_text = buttons[0].text if buttons else None
+        except StaleElementReferenceException: # Page re-rendered, no change
+            button_text = last_button_text
+        last_button_text = button_text
+
+        now = time.monotonic()
+        download_progress = _get_download_progress(existing_files)
+        state = (button_text, download_progress)
+        if state != last_state:
+            last_state, last_progress = state, now
+        elif download_progress and now - last_progress > stall_seconds:
+            raise TimeoutException('Export made no progress for '
+                f'{stall_seconds} seconds.')
+        if now - start > timeout:
+            raise TimeoutException('Export did not finish after timeout of '
+                f'{timeout:.0f} seconds.')
+
+        _raise_if_aborted()
+        time.sleep(poll_seconds)
+
+
+def _get_download_progress(existing_files):
+    """Returns the names and sizes of the files being downloaded."""
+
+    progress = []
+    for file_name in sorted(set(os.listdir(DOWNLOAD_DIR)) - existing_files):
+        try:
+            progress.append((file_name, os.path.getsize(os.path.join(DOWNLOAD_DIR, file_name))))
+        except OSError: # File renamed after finishing its download
+            pass
+    return tuple(progress)
+
+
+def _get_export_timeout(form_code, response_count, num_exports=1):
+    """Returns the timeout (in seconds) for each of `num_exports` exports of
+    the form's responses, based on the number of responses and the
+    throughput observed for this form (or for all forms, if this form has
+    not been exported before).
+    """
+
+    if response_count is None:
+        return EXPORT_TIMEOUT_SECONDS
+
+    throughput = THROUGHPUT.get(form_code) or THROUGHPUT.get('*') or DEFAULT_THROUGHPUT
+    expected_seconds = response_count / num_exports / throughput
+    return min(MAX_EXPORT_TIMEOUT_SECONDS,
+               max(MIN_EXPORT_TIMEOUT_SECONDS, EXPORT_TIMEOUT_FACTOR * expected_seconds))
+
+
+def _record_throughput(form_code, responses, seconds, weight=0.3):
+    """Updates the throughput of the form (and of all forms) with that of the
+    latest export, as a moving average, and saves it for future runs.
+    """
+
+    if not responses or seconds <= 0:
+        return
+
+    throughput = responses / seconds
+    for key in (form_code, '*'):
+        previous = THROUGHPUT.get(key)
+        THROUGHPUT[key] = throughput if previous is None \
+            else (1 - weight) * previous + weight * throughput
+    METRICS.observe('export_responses_per_second', throughput,
+        buckets=(10, 50, 100, 500, 1000, 5000, math.inf))
+
+    if THROUGHPUT_PATH:
+        _write_json(THROUGHPUT_PATH, THROUGHPUT)
+
+
+def _load_throughput(file_path):
+
+    global THROUGHPUT, THROUGHPUT_PATH
+    THROUGHPUT_PATH = file_path
+    THROUGHPUT = _read_json(file_path)
+
+
+def _record_schema(form_code, header):
+    """Saves the header of the latest export of the form for future runs.
+    A changed header is thus only reported for the first export with the
+    new columns.
+    """
+
+    if not header: # E.g., an empty download
+        return
+
+    SCHEMAS[form_code] = header
+    if SCHEMAS_PATH:
+        _write_json(SCHEMAS_PATH, SCHEMAS)
+
+
+def _load_schemas(file_path):
+
+    global SCHEMAS, SCHEMAS_PATH
+    SCHEMAS_PATH = file_path
+    SCHEMAS = _read_json(file_path)
+
+
+def _read_json(file_path):
+
+    try:
+        with open(file_path, 'rt', encoding='utf-8') as in_file:
+            return json.load(in_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(file_path, data):
+
+    # Write to a temporary file first so that the file is never left
+    #   half-written.
+    with open(file_path + '.tmp', 'wt', encoding='utf-8') as out_file:
+        json.dump(data, out_file, indent=2, sort_keys=True)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def _wait_for_download(existing_files, seconds=30):
+    """Waits for a new file (i.e., one not in `existing_files`) to finish
+    downloading into the download directory, and returns its path.
+    """
+
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        new_files = set(os.listdir(DOWNLOAD_DIR)) - existing_files
+        finished_files = [f for f in new_files if not f.endswith('.crdownload')]
+        if finished_files and len(finished_files) == len(new_files):
+            return os.path.join(DOWNLOAD_DIR, finished_files[0])
+        _raise_if_aborted()
+        time.sleep(0.5)
+
+    raise TimeoutException('Download did not finish in the download folder '
+        f'({DOWNLOAD_DIR}) after timeout of {seconds} seconds.')
+
+
+def _merge_shards(shard_paths):
+    """Merges the exports of each date range into a single file named after
+    the first export, removing the individual exports.
+    """
+
+    merged_path = shard_paths[0]
+    stem, ext = os.path.splitext(merged_path)
+    renamed_paths = []
+    for i, shard_path in enumerate(shard_paths):
+        renamed_path = f'{stem}.part{i}{ext}'
+        os.replace(shard_path, renamed_path)
+        renamed_paths.append(renamed_path)
+
+    csv_utils.merge_exports(renamed_paths, merged_path)
+    for renamed_path in renamed_paths:
+        os.remove(renamed_path)
+
+    return merged_path
+
+
+def _finalize_export(form_code, export_path, responses):
+    """Compresses the finished export and moves it into the content-addressed
+    store, if configured.
+
+    Returns:
+        str: The final path to the export.
+    """
+
+    METRICS.inc('exported_bytes_total', os.path.getsize(export_path), form=form_code)
+    METRICS.inc('exported_rows_total', responses, form=form_code)
+
+    if COMPRESSION:
+        export_path = compression.compress_file(
+            export_path, COMPRESSION, COMPRESSION_LEVEL)
+    if STORE_DIR:
+        output_store.store_export(export_path, STORE_DIR, form_code)
+    METRICS.inc('stored_bytes_total', os.path.getsize(export_path), form=form_code)
+    return export_path
+
+
+def _check_form_details(form_code):
+
+    if form_code not in FORMS:
+        return PreflightResult(form_code, False, 'Unknown form')
 
-    global D, IS_INIT
+    form_id = FORMS[form_code]['form_id']
+    if not re.fullmatch('[0-9a-fA-F]{24}', form_id):
+        return PreflightResult(form_code, False,
+            'Form ID is not a 24-character hexadecimal string')
+
+    try:
+        secret_key = base64.b64decode(FORMS[form_code]['secret_key'], validate=True)
+    except ValueError: # E.g., binascii.Error, or non-ASCII characters
+        secret_key = None
+    if secret_key is None or len(secret_key) != 32:
+        return PreflightResult(form_code, False,
+            'Secret key is not a 32-byte base64-encoded key')
+
+    return PreflightResult(form_code, True, '')
+
+
+def _check_form_access(form_code):
+
+    try:
+        _go_to_form_admin(form_code)
+    except NoSuchElementException:
+        return PreflightResult(form_code, False,
+            'Admin page did not load (wrong form ID or no access)')
+
+    try:
+        _go_to_data_tab()
+        _type('//*[@id="secretKeyInput"]', FORMS[form_code]['secret_key'], set_value_directly=True)
+    except NoSuchElementException:
+        if _is_element_visible('//*[@id="responses-tab"]//*[contains(text(),"No signs of movement")]'):
+            return PreflightResult(form_code, True, 'No data')
+        return PreflightResult(form_code, False, 'Responses page did not load')
+
+    _click('//button[.=" Unlock Responses "]', missing_ok=True)
+    if not _is_element_visible('//*[@id="btn-export"]', 5):
+        return PreflightResult(form_code, False,
+            'Secret key did not unlock the responses')
+
+    return PreflightResult(form_code, True, '')
+
+
+def _print_preflight_results(results):
+
+    width = max([len('Form')] + [len(result.form_code) for result in results])
+    print(f'    {"Form":<{width}}  Result  Details')
+    for form_code, ok, details in results:
+        print(f'    {form_code:<{width}}  {"PASS" if ok else "FAIL":<6}  {details}')
+
+
+def _init(download_dir=None, binary_path=None, force=False, store_dir=None,
+        compression_codec=None, compression_level=None, metrics_dir=None):
+
+    global D, IS_INIT, DOWNLOAD_DIR, STORE_DIR, METRICS_DIR, COMPRESSION, COMPRESSION_LEVEL
+    global RUN_START
     if (not IS_INIT) or force:
+        RUN_START = time.time()
 
         if not download_dir: # Default download directory
             download_dir = os.path.join(
                 os.path.basename(__file__), '..', 'data', 'raw',
                 dt.datetime.strftime(dt.datetime.now(), '%Y-%m-%d_%H%Mh'))
+            if not store_dir: # Share a single store across the default runs
+                store_dir = os.path.join(
+                    os.path.basename(__file__), '..', 'data', 'store')
+            throughput_path = os.path.join(
+                os.path.basename(__file__), '..', 'data', 'throughput.json')
+            if not metrics_dir: # A fixed folder for the textfile collector
+                metrics_dir = os.path.join(
+                    os.path.basename(__file__), '..', 'data', 'metrics')
+        else:
+            throughput_path = os.path.join(download_dir, 'throughput.json')
 
         download_dir = os.path.abspath(download_dir)
         print('[*] Ensuring that folder exists at:', download_dir)
         os.makedirs(download_dir, exist_ok=True)
+        DOWNLOAD_DIR = download_dir
+        STORE_DIR = os.path.abspath(store_dir) if store_dir else None
+        METRICS_DIR = os.path.abspath(metrics_dir) if metrics_dir else None
+        _load_throughput(os.path.abspath(throughput_path))
+        _load_schemas(os.path.join(
+            os.path.dirname(os.path.abspath(throughput_path)), 'schemas.json'))
+        if compression_codec and compression_codec != 'none':
+            compression.check_codec(compression_codec, compression_level)
+            COMPRESSION, COMPRESSION_LEVEL = compression_codec, compression_level
+        else:
+            COMPRESSION, COMPRESSION_LEVEL = None, None
 
         print('[*] Initializing Selenium')
         chrome_options = webdriver.ChromeOptions()
         prefs = {'download.default_directory': download_dir}
         chrome_options.add_experimental_option('prefs', prefs)
         chrome_options.add_argument('--headless --disable-gpu')
-        if binary_path:
-            D = webdriver.Chrome(binary_path, options=chrome_options)
-        else:
-            D = webdriver.Chrome(options=chrome_options)
+        with METRICS.timer('browser_startup_seconds'):
+            if binary_path:
+                D = webdriver.Chrome(binary_path, options=chrome_options)
+            else:
+                D = webdriver.Chrome(options=chrome_options)
 
         IS_INIT = True
 
-    init_settings = {'download_dir': download_dir}
+    init_settings = {'download_dir': download_dir, 'store_dir': store_dir}
     return init_settings
 
 
@@ -160,6 +656,7 @@ def _init(download_dir=None, binary_path=None, force=False):
 
 def _type(element_xpath, characters, set_value_directly=False):
 
+    _raise_if_aborted()
     elem = _wait_for_element(element_xpath, 1)
     # elem = D.find_element_by_xpath(element_xpath)
     to_clear = '[clear]' in characters
@@ -183,6 +680,7 @@ def _type(element_xpath, characters, set_value_directly=False):
 
 def _click(element_xpath, missing_ok=False):
 
+    _raise_if_aborted()
     try:
         elem = D.find_element_by_xpath(element_xpath)
         D.execute_script('arguments[0].click()', elem)
@@ -190,9 +688,12 @@ def _click(element_xpath, missing_ok=False):
         if missing_ok:
             pass
         else:
+            METRICS.inc('click_errors_total')
             print(f'Error while trying to click the element "{element_xpath}". '
                   'Full error message is as below:')
             print(e)
+            if not INTERACTIVE:
+                raise
 
             next_step = input('Proceed as usual? (Y/n) ').lower()
             while next_step not in ['y', 'n', '']:
@@ -201,6 +702,12 @@ def _click(element_xpath, missing_ok=False):
                 raise
 
 
+def _raise_if_aborted():
+
+    if ABORT.is_set():
+        raise DownloadAborted('Download aborted.')
+
+
 # Selenium helper functions
 
 def _is_element_visible(element_xpath, seconds=1):
@@ -244,10 +751,67 @@ def _set_forms_details(forms):
         FORMS[f_name] = { 'secret_key': f_secret_key, 'form_id': f_id }
 
 
+def _load_forms_file(file_path):
+    """Loads forms from a session file (.formsg) or a credentials file (.csv),
+    as saved by the GUI.
+    """
+
+    forms = cli_utils.read_forms_file(file_path)
+    _set_forms_details(forms)
+    return [form[0] for form in forms]
+
+
+def _parse_args(args=None):
+
+    parser = argparse.ArgumentParser(
+        description='Downloads the responses of FormSG forms as CSV files.')
+    parser.add_argument('--forms', metavar='FORMS_FILE',
+        help='Session file (.formsg) or credentials file (.csv, with the form '
+             'name, form ID, and form secret key on each line) of the forms '
+             'to download')
+    parser.add_argument('--download-dir', help='Folder to save the data to')
+    parser.add_argument('--chrome-driver', help='Path to the Chrome Driver')
+    parser.add_argument('--store-dir',
+        help='Folder to keep a single copy of each distinct export in '
+             '(default: data/store, or no store if --download-dir is given)')
+    parser.add_argument('--compression', choices=('none',) + compression.CODECS,
+        default='none', help='Compress the downloaded data (default: none)')
+    parser.add_argument('--compression-level', type=int,
+        help='Compression level, from 0 to 9 for gzip (default: 6), or from 1 '
+             'to 22 for zstd (default: 3)')
+    parser.add_argument('--metrics-dir',
+        help='Folder to write the run metrics to, e.g., the folder watched by '
+             'the Prometheus textfile collector (default: data/metrics, or '
+             'the download folder if --download-dir is given)')
+    parser.add_argument('--skip-preflight', action='store_true',
+        help='Download every form without checking them first')
+    cli_utils.add_shard_arguments(parser)
+    args = parser.parse_args(args)
+    cli_utils.check_shard_arguments(parser, args)
+    if args.compression != 'none':
+        try:
+            compression.check_codec(args.compression, args.compression_level)
+        except (ValueError, ImportError) as e:
+            parser.error(str(e))
+    return args
+
+
 if __name__ == '__main__':
 
+    args = _parse_args()
+    form_codes = _load_forms_file(args.forms) if args.forms else []
     email = input('Please enter your email address: ')
-    init_settings = _init()
+    init_settings = _init(args.download_dir, args.chrome_driver,
+        store_dir=args.store_dir,
+        compression_codec=args.compression,
+        compression_level=args.compression_level,
+        metrics_dir=args.metrics_dir)
     login(email)
+    if form_codes and not args.skip_preflight:
+        form_codes = [result.form_code for result in preflight(form_codes)
+                      if result.ok]
+    for form_code in form_codes:
+        download_csv(form_code, args.shards, args.start_date, args.end_date)
+    write_metrics()
     print(f'[*] Data downloaded to: {init_settings["download_dir"]}')
     close()
@@ -8,11 +8,12 @@ from collections import namedtuple, OrderedDict
 
 # third-party
 import tkinter as tk
-import selenium
 from tkinter import filedialog, messagebox, ttk
 
 # current package
-from formsgdownloader import formsg_driver
+# Note: `formsgdownloader.formsg_driver` (and hence selenium) is only imported
+#   when the download starts, so that the window appears as soon as possible.
+from formsgdownloader import compression
 from formsgdownloader.pyinstaller_utils import get_path
 from formsgdownloader.tk_utils import MenuAction, YjMenu, YjTreeview
 
@@ -69,6 +70,9 @@ class App:
         # Data
         self.chrome_driver_path = tk.StringVar()
         self.download_path = tk.StringVar()
+        self.compression = tk.StringVar(value='none')
+        self.metrics_path = tk.StringVar()
+        self.store_path = tk.StringVar()
         self.forms = OrderedDict()
         self.form_name = tk.StringVar()
         self.form_id = tk.StringVar()
@@ -86,29 +90,14 @@ class App:
         self.populate_widgets(master)
         self.initialize_widgets()
         self.bind_actions()
-        self.initialize_log_window_and_logging()
-        self.initialize_help_window()
+        self.initialize_logging()
 
 
 #region Initialization Methods
-    def initialize_log_window_and_logging(self):
+    def initialize_logging(self):
 
-        # Create logging window
-        toplevel_log = tk.Toplevel(self.master)
-        toplevel_log.withdraw()
-        toplevel_log.title('Logs')
-        toplevel_log.protocol('WM_DELETE_WINDOW', toplevel_log.withdraw)
-        toplevel_log.iconbitmap(FAVICON_PATH)
-
-        text_log = tk.Text(toplevel_log, state='normal')
-        text_log.insert('end', 'Log Messages:\n')
-        text_log['state'] = 'disabled'
-        text_log.pack(fill=tk.BOTH)
-
-        self.widgets['toplevel_log'] = toplevel_log
-        self.widgets['text_log'] = text_log
-
-        # Redirect STDOUT to logs
+        # Redirect STDOUT to logs, which are buffered until the logging window
+        #   is first shown
         self.logStream = io.StringIO()
         import sys
         sys.stdout = self.logStream
@@ -116,18 +105,38 @@ class App:
         # Poll for updates to logs
         def poll_log():
             while True:
+                text_log = self.widgets.get('text_log')
                 self.logStream.seek(0)
                 msg = self.logStream.read()
-                if msg:
+                if msg and text_log is not None:
                     text_log['state'] = 'normal'
                     text_log.insert('end', msg)
                     text_log['state'] = 'disabled'
                     self.logStream.seek(0)
                     self.logStream.truncate()
+                else:
+                    self.logStream.seek(0, io.SEEK_END)
                 time.sleep(1) # Polling interval
 
         threading.Thread(target=poll_log, daemon=True).start()
 
+    def initialize_log_window(self):
+
+        # Create logging window
+        toplevel_log = tk.Toplevel(self.master)
+        toplevel_log.withdraw()
+        toplevel_log.title('Logs')
+        toplevel_log.protocol('WM_DELETE_WINDOW', toplevel_log.withdraw)
+        toplevel_log.iconbitmap(FAVICON_PATH)
+
+        text_log = tk.Text(toplevel_log, state='normal')
+        text_log.insert('end', 'Log Messages:\n')
+        text_log['state'] = 'disabled'
+        text_log.pack(fill=tk.BOTH)
+
+        self.widgets['toplevel_log'] = toplevel_log
+        self.widgets['text_log'] = text_log
+
     def initialize_help_window(self):
 
         toplevel_help = tk.Toplevel(self.master)
@@ -200,6 +209,34 @@ class App:
                             'textvariable': self.download_path,
                             'width': 64},
                 'grid', {'column': 1, 'row': 2, 'pady': ROW_PADDING, 'padx': COL_PADDING}),
+            Widget('label_compression',
+                ttk.Label, {'parent': 'frame_config',
+                            'text': 'Compression:'},
+                'grid', {'column': 0, 'row': 3, 'pady': ROW_PADDING, 'padx': COL_PADDING}),
+            Widget('combobox_compression',
+                ttk.Combobox, {'parent': 'frame_config',
+                               'textvariable': self.compression,
+                               'values': ('none',) + compression.available_codecs(),
+                               'state': 'readonly'},
+                'grid', {'column': 1, 'row': 3, 'pady': ROW_PADDING, 'padx': COL_PADDING, 'sticky': 'W'}),
+            Widget('button_set-metrics-path',
+                ttk.Button, { 'parent': 'frame_config',
+                              'text': 'Click to set metrics path:'},
+                'grid', {'column': 0, 'row': 4, 'pady': ROW_PADDING, 'padx': COL_PADDING, 'sticky': 'EW'}),
+            Widget('label_metrics-path',
+                ttk.Entry, {'parent': 'frame_config',
+                            'textvariable': self.metrics_path,
+                            'width': 64},
+                'grid', {'column': 1, 'row': 4, 'pady': ROW_PADDING, 'padx': COL_PADDING}),
+            Widget('button_set-store-path',
+                ttk.Button, { 'parent': 'frame_config',
+                              'text': 'Click to set store path:'},
+                'grid', {'column': 0, 'row': 5, 'pady': ROW_PADDING, 'padx': COL_PADDING, 'sticky': 'EW'}),
+            Widget('label_store-path',
+                ttk.Entry, {'parent': 'frame_config',
+                            'textvariable': self.store_path,
+                            'width': 64},
+                'grid', {'column': 1, 'row': 5, 'pady': ROW_PADDING, 'padx': COL_PADDING}),
 
             Widget('frame_form', ttk.LabelFrame, {'text': 'Step 1: Load Forms'}, 'grid', {'column': 0, 'row': 1, 'padx': 10, 'pady': 10}),
 
@@ -286,6 +323,10 @@ class App:
                 lambda _: self.set_chrome_driver_path()),
             Action('button_set-download-path', '<Button-1>',
                 lambda _: self.set_download_path()),
+            Action('button_set-metrics-path', '<Button-1>',
+                lambda _: self.set_metrics_path()),
+            Action('button_set-store-path', '<Button-1>',
+                lambda _: self.set_store_path()),
 
             Action('button_add-form', '<Button-1>',
                 lambda _: self.add_form()),
@@ -305,10 +346,14 @@ class App:
 #region GUI Event Handlers
     def show_logs(self):
 
+        if 'toplevel_log' not in self.widgets:
+            self.initialize_log_window()
         self.widgets['toplevel_log'].deiconify()
 
     def show_help(self):
 
+        if 'toplevel_help' not in self.widgets:
+            self.initialize_help_window()
         self.widgets['toplevel_help'].deiconify()
 
     def save_session(self):
@@ -325,6 +370,9 @@ class App:
                 'email': self.email.get(),
                 'chrome_driver_path': self.chrome_driver_path.get(),
                 'download_path': self.download_path.get(),
+                'compression': self.compression.get(),
+                'metrics_path': self.metrics_path.get(),
+                'store_path': self.store_path.get(),
             }
             with open(file_path, 'wb') as out_file:
                 out_file.write(json.dumps(data).encode('utf-8'))
@@ -351,6 +399,12 @@ class App:
                 self.email.set(json_data['email'])
                 self.chrome_driver_path.set(json_data['chrome_driver_path'])
                 self.download_path.set(json_data['download_path'])
+                codec = json_data.get('compression', 'none')
+                if codec not in compression.available_codecs():
+                    codec = 'none'
+                self.compression.set(codec)
+                self.metrics_path.set(json_data.get('metrics_path', ''))
+                self.store_path.set(json_data.get('store_path', ''))
 
     def export_forms(self):
 
@@ -387,6 +441,14 @@ class App:
 
         self.download_path.set(filedialog.askdirectory())
 
+    def set_metrics_path(self):
+
+        self.metrics_path.set(filedialog.askdirectory())
+
+    def set_store_path(self):
+
+        self.store_path.set(filedialog.askdirectory())
+
     def add_form(self):
 
         form_name = self.form_name.get().strip()
@@ -404,31 +466,58 @@ class App:
 
     def download_all_forms(self):
 
+        # Check the options up front, as errors in the download thread only
+        #   show up in the logs
+        codec = self.compression.get()
+        if codec != 'none':
+            try:
+                compression.check_codec(codec)
+            except (ValueError, ImportError) as e:
+                messagebox.askokcancel('Error', message='Invalid compression',
+                    detail=str(e), icon='error')
+                return
+
         threading.Thread(target=self._download_all_forms, daemon=True).start()
 
     def _download_all_forms(self):
-        
-        self.disable_all_widgets()
-
-        # Initialize selenium_gui
-        selenium_gui._set_forms_details(self.forms)
-        selenium_gui._init(
-            self.download_path.get(),
-            self.chrome_driver_path.get(), force=True)
-
-        # Log into form.gov.sg
-        self.login_to_formsg()
 
-        # Download data for each form
-        for form in self.forms:
-            try:
-                selenium_gui.download_csv(form.name)
-            except selenium.common.exceptions.WebDriverException as e:
-                print(f'[!] Error downloading data from form: {form}.')
-                print(e)
-        print('[*] Download finished!')
+        from formsgdownloader import formsg_driver
 
-        self.enable_all_widgets()
+        self.disable_all_widgets()
+        try:
+            # Initialize formsg_driver
+            formsg_driver._set_forms_details(self.forms)
+            formsg_driver._init(
+                self.download_path.get(),
+                self.chrome_driver_path.get(), force=True,
+                store_dir=self.store_path.get() or None,
+                compression_codec=self.compression.get(),
+                metrics_dir=self.metrics_path.get() or None)
+
+            # Log into form.gov.sg
+            self.login_to_formsg()
+
+            # Check the forms, then download data for each form that passes
+            results = formsg_driver.preflight([form.name for form in self.forms])
+            passed = {result.form_code for result in results if result.ok}
+            for form in self.forms:
+                if form.name not in passed:
+                    print(f'[!] Skipping form that failed pre-flight checks: {form.name}.')
+                    continue
+                try:
+                    formsg_driver.download_csv(form.name)
+                except Exception as e: # Carry on with the remaining forms
+                    print(f'[!] Error downloading data from form: {form}.')
+                    print(e)
+            print('[*] Download finished!')
+            formsg_driver.write_metrics()
+        except Exception as e:
+            print('[!] Download stopped due to an error.')
+            print(e)
+        finally:
+            # Leave the GUI usable even if the download failed
+            self.enable_all_widgets()
+            self.widgets['combobox_compression']['state'] = 'readonly'
 #endregion
 
 #region GUI Methods
@@ -473,7 +562,9 @@ class App:
 #region Helper Methods
     def login_to_formsg(self):
 
-        selenium_gui.enter_email(self.email.get())
+        from formsgdownloader import formsg_driver
+
+        formsg_driver.enter_email(self.email.get())
 
         continue_button_press = threading.Event()
         self.widgets['button_continue'].bind('<Button-1>',
@@ -489,7 +580,7 @@ class App:
         self.widgets['entry_one-time-password']['state'] = 'disabled'
         self.widgets['button_continue']['state'] = 'disabled'
         otp = self.one_time_password.get()
-        selenium_gui.enter_one_time_password(otp)
+        formsg_driver.enter_one_time_password(otp)
 
     def _add_form(self, form):
 
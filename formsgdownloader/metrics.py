@@ -0,0 +1,162 @@
+"""This metrics module collects counters, gauges, and histograms during a run,
+and writes them out in the Prometheus textfile collector format and as JSON,
+for alerting on unattended runs.
+
+Usage: Record values with `inc()`, `set()`, `observe()`, or `timer()`, e.g.,
+    `METRICS.inc('failures_total', step='export')`, then call `write()` at the
+    end of the run. Metric names are prefixed with `formsg_`.
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+PREFIX = 'formsg_'
+DEFAULT_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, math.inf)
+FILE_NAME = 'formsg_downloader'
+
+
+class Metrics:
+    """A thread-safe collection of metrics, each keyed by its name and
+    labels.
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """Increments the counter `name`."""
+
+        key = (name, _freeze(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Sets the gauge `name`."""
+
+        with self.lock:
+            self.gauges[(name, _freeze(labels))] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """Records `value` in the histogram `name`."""
+
+        key = (name, _freeze(labels))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, {
+                'buckets': dict.fromkeys(buckets, 0), 'sum': 0, 'count': 0})
+            for upper_bound in histogram['buckets']:
+                if value <= upper_bound:
+                    histogram['buckets'][upper_bound] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Records the duration (in seconds) of the `with` block in the
+        histogram `name`, whether or not the block raises.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+
+        lines = []
+        with self.lock:
+            for metric_type, metrics in (('counter', self.counters),
+                                         ('gauge', self.gauges)):
+                for name in sorted({name for name, _ in metrics}):
+                    lines.append(f'# TYPE {PREFIX}{name} {metric_type}')
+                    for (other_name, labels), value in sorted(metrics.items()):
+                        if other_name == name:
+                            lines.append(f'{PREFIX}{name}{_format_labels(labels)} {value}')
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f'# TYPE {PREFIX}{name} histogram')
+                for (other_name, labels), histogram in sorted(self.histograms.items()):
+                    if other_name != name:
+                        continue
+                    for upper_bound, count in histogram['buckets'].items():
+                        le = '+Inf' if upper_bound == math.inf else repr(float(upper_bound))
+                        bucket_labels = labels + (('le', le),)
+                        lines.append(f'{PREFIX}{name}_bucket{_format_labels(bucket_labels)} {count}')
+                    lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+                    lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        """Returns the metrics as a JSON-serializable dict."""
+
+        with self.lock:
+            return {
+                'counters': [_to_json_entry(key, value)
+                             for key, value in sorted(self.counters.items())],
+                'gauges': [_to_json_entry(key, value)
+                           for key, value in sorted(self.gauges.items())],
+                'histograms': [_to_json_entry(key, {
+                        'buckets': {('+Inf' if upper_bound == math.inf else upper_bound): count
+                                    for upper_bound, count in histogram['buckets'].items()},
+                        'sum': histogram['sum'],
+                        'count': histogram['count']})
+                    for key, histogram in sorted(self.histograms.items())],
+            }
+
+    def write(self, dir_path, file_name=FILE_NAME):
+        """Atomically writes the metrics to `<file_name>.prom` and
+        `<file_name>.json` in `dir_path`.
+
+        Returns:
+            tuple: The paths to the two files.
+        """
+
+        prom_path = os.path.join(dir_path, file_name + '.prom')
+        json_path = os.path.join(dir_path, file_name + '.json')
+        _write_atomically(prom_path, self.to_prometheus())
+        _write_atomically(json_path, json.dumps(self.to_json(), indent=2))
+        return prom_path, json_path
+
+
+# Helper functions
+
+def _freeze(labels):
+
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"'
+                          for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _to_json_entry(key, value):
+
+    name, labels = key
+    return {'name': PREFIX + name, 'labels': dict(labels), 'value': value}
+
+
+def _write_atomically(file_path, content):
+
+    # Write to a temporary file first so that collectors never read a
+    #   half-written file. The temporary file is per process, in case several
+    #   processes write the same file.
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wt', encoding='utf-8') as out_file:
+        out_file.write(content)
+    os.replace(tmp_path, file_path)
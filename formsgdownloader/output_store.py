@@ -0,0 +1,108 @@
+"""This output_store module keeps a single copy of each distinct export in a
+content-addressed store, so that re-downloading unchanged forms on every run
+costs no extra disk space.
+
+Each finished export is hashed and moved into the store at
+`<store_dir>/<first 2 characters of hash>/<hash><extension>`, made
+read-only (as it may be shared by several runs), then hard linked back into
+the run directory. Each run directory also gets a manifest
+mapping the form codes to the hashes of their exports, so two runs can be
+compared without reading the exports themselves.
+"""
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+
+MANIFEST_FILE_NAME = 'manifest.json'
+CHUNK_SIZE = 1024 * 1024
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def store_export(file_path, store_dir, form_code):
+    """Moves the export at `file_path` into the store (unless an identical
+    export is already stored), links it back to `file_path`, and records it
+    in the manifest of the run directory containing `file_path`.
+
+    Returns:
+        str: The hash of the export.
+    """
+
+    digest = hash_file(file_path)
+    _, ext = os.path.splitext(file_path)
+    stored_path = os.path.join(store_dir, digest[:2], digest + ext)
+
+    if os.path.exists(stored_path):
+        os.remove(file_path)
+    else:
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        shutil.move(file_path, stored_path)
+        os.chmod(stored_path, READ_ONLY)
+    _link_or_copy(stored_path, file_path)
+
+    update_manifest(os.path.dirname(file_path), form_code,
+        os.path.basename(file_path), digest)
+
+    return digest
+
+
+def hash_file(file_path):
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def read_manifest(run_dir):
+    """Returns the mapping of form code to the file name and hash of its
+    export for the run directory `run_dir`.
+    """
+
+    manifest_path = os.path.join(run_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'rt', encoding='utf-8') as in_file:
+        return json.load(in_file)['forms']
+
+
+def update_manifest(run_dir, form_code, file_name, digest):
+
+    forms = read_manifest(run_dir)
+    forms[form_code] = {'file': file_name, 'sha256': digest}
+
+    # Write to a temporary file first so that the manifest is never left
+    #   half-written.
+    manifest_path = os.path.join(run_dir, MANIFEST_FILE_NAME)
+    with open(manifest_path + '.tmp', 'wt', encoding='utf-8') as out_file:
+        json.dump({'forms': forms}, out_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def diff_runs(run_dir, other_run_dir):
+    """Compares the manifests of two run directories.
+
+    Returns:
+        list of str: The form codes whose exports differ between the runs,
+            including forms present in only one of the runs.
+    """
+
+    forms = read_manifest(run_dir)
+    other_forms = read_manifest(other_run_dir)
+    return sorted(
+        form_code for form_code in set(forms) | set(other_forms)
+        if forms.get(form_code, {}).get('sha256')
+            != other_forms.get(form_code, {}).get('sha256'))
+
+
+# Helper functions
+
+def _link_or_copy(src, dst):
+
+    try:
+        os.link(src, dst)
+    except OSError: # E.g., file system without hard links, or across devices
+        shutil.copy2(src, dst)
@@ -0,0 +1,148 @@
+"""This reader module reads the exports downloaded by `formsg_driver` one
+response at a time, so that even very large exports are read in constant
+memory.
+
+Usage: Iterate over `ExportReader` (or call `iter_responses()`), passing in
+    the columns to read (other columns are skipped), and which columns hold
+    multiple answers (e.g., checkbox fields) or tables, e.g.,
+
+    with ExportReader('form.csv.gz', columns=['Timestamp', 'Name', 'Pets'],
+                      list_columns=['Pets']) as reader:
+        for response in reader:
+            print(response['Timestamp'].date(), response['Pets'])
+
+    Each response is a dict mapping the column name to its value, with the
+    "Timestamp" column parsed into a `datetime.datetime`, multiple answers
+    split into a list of strings, and tables split into a list of rows (each
+    a list of strings).
+"""
+import csv
+from operator import itemgetter
+
+from formsgdownloader import csv_utils
+from formsgdownloader.compression import open_export
+
+
+MULTI_ANSWER_SEPARATOR = ';'
+TABLE_CELL_SEPARATOR = ','
+
+
+class ExportReader:
+    """Reads the responses in a FormSG export, which may be compressed.
+
+    Args:
+        file_path (str): The path to the export.
+        columns (iterable of str): The columns to read. Defaults to all
+            columns.
+        list_columns (iterable of str): The columns holding multiple answers
+            separated by ";", to be split into a list.
+        table_columns (iterable of str): The columns holding tables, with
+            rows separated by ";" and cells separated by ",", to be split into
+            a list of lists.
+        parse_timestamps (bool): Whether to parse the "Timestamp" column.
+
+    Attributes:
+        preamble (list of list of str): The metadata rows before the header.
+        header (list of str): All the columns in the export.
+        columns (tuple of str): The columns read.
+    """
+
+    def __init__(self, file_path, columns=None, list_columns=(),
+            table_columns=(), parse_timestamps=True):
+
+        self.file = open_export(file_path, 'rt', encoding=csv_utils.ENCODING, newline='')
+        try:
+            self.reader = csv.reader(self.file)
+            self.preamble, self.header = csv_utils.split_preamble(self.reader)
+            self.columns = tuple(self.header if columns is None else columns)
+            self._get_values = self._make_getter(self.columns)
+            self._parsers = self._make_parsers(
+                list_columns, table_columns, parse_timestamps)
+        except Exception:
+            self.file.close()
+            raise
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def __iter__(self):
+
+        columns, get_values, parsers = self.columns, self._get_values, self._parsers
+        num_columns = len(self.header)
+        for row in self.reader:
+            if len(row) < num_columns: # E.g., trailing blank line
+                if not row:
+                    continue
+                row += [''] * (num_columns - len(row))
+            if parsers:
+                values = list(get_values(row))
+                for index, parse in parsers:
+                    values[index] = parse(values[index])
+                yield dict(zip(columns, values))
+            else:
+                yield dict(zip(columns, get_values(row)))
+
+    def close(self):
+
+        self.file.close()
+
+    def _make_getter(self, columns):
+
+        if not columns:
+            raise ValueError('At least one column must be read')
+        unknown_columns = [column for column in columns if column not in self.header]
+        if unknown_columns:
+            raise ValueError(f'Columns not found in export: {unknown_columns}')
+
+        indices = [self.header.index(column) for column in columns]
+        if len(indices) == 1: # `itemgetter` with 1 index does not return a tuple
+            index = indices[0]
+            return lambda row: (row[index],)
+        return itemgetter(*indices)
+
+    def _make_parsers(self, list_columns, table_columns, parse_timestamps):
+        """Returns the parser of each column to be parsed, as a list of
+        2-tuples of the column's index in `columns` and the parser.
+        """
+
+        parsers = []
+        if parse_timestamps:
+            parsers.append((csv_utils.TIMESTAMP_COLUMN, _parse_timestamp))
+        parsers.extend((column, _split_answers) for column in list_columns)
+        parsers.extend((column, _split_table) for column in table_columns)
+        return [(self.columns.index(column), parse) for column, parse in parsers
+                if column in self.columns]
+
+
+def iter_responses(file_path, **kwargs):
+    """Yields each response in the export at `file_path`. See `ExportReader`
+    for the keyword arguments.
+    """
+
+    with ExportReader(file_path, **kwargs) as reader:
+        yield from reader
+
+
+# Helper functions
+
+def _parse_timestamp(value):
+
+    # Keep the raw value if the format is not recognized
+    timestamp = csv_utils.parse_timestamp(value)
+    return value if timestamp is None else timestamp
+
+
+def _split_answers(value):
+
+    return value.split(MULTI_ANSWER_SEPARATOR) if value else []
+
+
+def _split_table(value):
+
+    return [table_row.split(TABLE_CELL_SEPARATOR)
+            for table_row in value.split(MULTI_ANSWER_SEPARATOR)] if value else []
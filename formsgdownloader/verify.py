@@ -0,0 +1,115 @@
+"""This verify module checks that a downloaded export is complete, i.e., that
+it is not truncated, that its header is as expected, and that it contains the
+expected number of responses.
+
+Records are counted without parsing the CSV: the file is memory-mapped, and
+only the quotes and newlines in it are looked at (a newline ends a record
+unless it is inside a quoted field), which takes a small fraction of the
+time needed to parse the file.
+"""
+import csv
+import mmap
+from collections import namedtuple
+
+from formsgdownloader import csv_utils
+from formsgdownloader.compression import get_codec, open_export
+
+
+VerificationResult = namedtuple('VerificationResult', 'ok responses header problems')
+
+CHUNK_SIZE = 16 * 1024 * 1024
+FORMSG_COLUMNS = [csv_utils.RESPONSE_ID_COLUMN, csv_utils.TIMESTAMP_COLUMN]
+
+# All bytes other than the quote and newline characters
+_IGNORED_BYTES = bytes(b for b in range(256) if b not in b'"\n')
+
+
+def verify_export(file_path, expected_count=None, expected_header=None):
+    """Verifies the export at `file_path`.
+
+    Args:
+        file_path (str): The path to the export.
+        expected_count (int): The expected number of responses, e.g., as shown
+            in the Data tab of the form. Also checked against the expected
+            count in the preamble of the export, if any.
+        expected_header (list of str): The expected columns of the export.
+
+    Returns:
+        VerificationResult: The result, with `problems` being a list of
+            descriptions of each problem found.
+    """
+
+    problems = []
+    records, ends_in_quotes = _scan(file_path)
+    if ends_in_quotes:
+        problems.append('File ends inside a quoted field (truncated?)')
+
+    with open_export(file_path, 'rt', encoding=csv_utils.ENCODING, newline='') as in_file:
+        preamble, header = csv_utils.split_preamble(csv.reader(in_file))
+    responses = max(records - len(preamble) - 1, 0)
+
+    if header[:len(FORMSG_COLUMNS)] != FORMSG_COLUMNS:
+        problems.append(f'Header does not start with the FormSG columns: '
+            f'{", ".join(FORMSG_COLUMNS)}')
+    if expected_header is not None and header != list(expected_header):
+        missing = [column for column in expected_header if column not in header]
+        unexpected = [column for column in header if column not in expected_header]
+        problems.append('Header does not match the expected columns (missing: '
+            f'{missing or "none"}, unexpected: {unexpected or "none"})')
+
+    preamble_count = csv_utils.get_expected_count(preamble)
+    for source, count in (('Data tab', expected_count), ('preamble', preamble_count)):
+        if count is not None and count != responses:
+            problems.append(f'Found {responses} responses, but the {source} '
+                f'shows {count}')
+
+    return VerificationResult(not problems, responses, header, problems)
+
+
+def count_records(file_path):
+    """Returns the number of CSV records (including the preamble and header
+    rows) in the file at `file_path`.
+    """
+
+    records, _ = _scan(file_path)
+    return records
+
+
+# Helper functions
+
+def _scan(file_path):
+    """Returns the number of records in the file, and whether the file ends
+    inside a quoted field.
+    """
+
+    records, in_quotes, last_byte = 0, 0, b'\n'
+    for chunk in _iter_chunks(file_path):
+        # Only the parity of the number of quotes before a newline matters,
+        #   so drop all other bytes, and runs of an even number of quotes.
+        reduced = chunk.translate(None, _IGNORED_BYTES).replace(b'""', b'')
+        parts = reduced.split(b'"')
+        records += sum(part.count(b'\n') for part in parts[in_quotes::2])
+        in_quotes = (in_quotes + len(parts) - 1) % 2
+        last_byte = chunk[-1:]
+
+    if last_byte != b'\n' or in_quotes: # Last record without a trailing newline
+        records += 1
+
+    return records, bool(in_quotes)
+
+
+def _iter_chunks(file_path):
+
+    if get_codec(file_path) is not None:
+        with open_export(file_path, 'rb') as in_file:
+            yield from iter(lambda: in_file.read(CHUNK_SIZE), b'')
+        return
+
+    with open(file_path, 'rb') as in_file:
+        try:
+            mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # Empty file
+            return
+        with mapped:
+            for offset in range(0, len(mapped), CHUNK_SIZE):
+                yield mapped[offset:offset + CHUNK_SIZE]
@@ -0,0 +1,365 @@
+"""This work_queue module distributes form downloads across several worker
+processes (possibly on different machines) through a job queue kept in a
+SQLite database on a shared volume.
+
+Usage: On one machine, load the forms into the queue:
+
+    $ python -m formsgdownloader.work_queue coordinator --queue Q --forms FILE
+
+    where FILE is either a session file (.formsg) or a credentials file
+    (.csv) saved from the GUI. Then, on each machine, start a worker:
+
+    $ python -m formsgdownloader.work_queue worker --queue Q --email EMAIL
+
+    Each worker logs into FormSG, then repeatedly leases a form from the
+    queue, downloads it, and acknowledges it. A lease expires if it is not
+    renewed in time (e.g., the worker died), after which the form is handed
+    out to another worker.
+
+Note: The queue contains the secret keys of the forms, so it should be
+    protected in the same way as the session and credentials files.
+"""
+import argparse
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from formsgdownloader import cli_utils, metrics
+
+
+Job = namedtuple('Job', 'id form_name form_id secret_key attempts')
+
+DEFAULT_LEASE_SECONDS = 15 * 60
+DEFAULT_MAX_ATTEMPTS = 3
+RENEW_RETRY_SECONDS = 10
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    form_name TEXT NOT NULL UNIQUE,
+    form_id TEXT NOT NULL,
+    secret_key TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+)
+'''
+
+
+class WorkQueue:
+    """A queue of form downloads, each of which is leased to one worker at a
+    time.
+
+    Args:
+        db_path (str): Path to the SQLite database, created if missing.
+        lease_seconds (float): How long a worker holds a job before it is
+            handed out again, unless the lease is renewed.
+        max_attempts (int): How many times a job is attempted before it is
+            marked as failed.
+    """
+
+    def __init__(self, db_path, lease_seconds=DEFAULT_LEASE_SECONDS,
+            max_attempts=DEFAULT_MAX_ATTEMPTS):
+
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with self._transaction() as conn:
+            conn.execute(SCHEMA)
+
+    def enqueue(self, forms):
+        """Adds forms to the queue, skipping forms that are already queued.
+
+        Args:
+            forms (iterable of tuple): An iterable of 3-tuples, each
+                representing the form name, form ID, and form secret key.
+
+        Returns:
+            int: The number of forms added.
+        """
+
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                'INSERT OR IGNORE INTO jobs (form_name, form_id, secret_key) '
+                'VALUES (?, ?, ?)', forms)
+            return cursor.rowcount
+
+    def lease(self, worker):
+        """Leases the next pending job (or a job whose lease has expired) to
+        `worker`.
+
+        Returns:
+            Job: The leased job, or `None` if no job is available.
+        """
+
+        now = time.time()
+        with self._transaction() as conn:
+            # Jobs whose lease expired on their last attempt (e.g., the form
+            #   crashed or hung its worker) are not retried again
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_expires = NULL, "
+                "error = COALESCE(error, 'Lease expired') "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts))
+            row = conn.execute(
+                'SELECT id, form_name, form_id, secret_key, attempts FROM jobs '
+                "WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < ?) "
+                'ORDER BY attempts, id LIMIT 1', (now,)).fetchone()
+            if row is None:
+                return None
+
+            job = Job(*row[:4], row[4] + 1)
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, "
+                'lease_expires = ?, attempts = ? WHERE id = ?',
+                (worker, now + self.lease_seconds, job.attempts, job.id))
+            return job
+
+    def renew(self, job_id, worker):
+        """Extends the lease of `worker` on the job.
+
+        Returns:
+            bool: Whether the lease was still held by `worker`.
+        """
+
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET lease_expires = ? '
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, job_id, worker))
+            return cursor.rowcount == 1
+
+    def ack(self, job_id, worker):
+        """Marks the job as done."""
+
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', lease_expires = NULL, "
+                'error = NULL WHERE id = ? AND worker = ?', (job_id, worker))
+
+    def fail(self, job_id, worker, error):
+        """Returns the job to the queue to be retried, or marks it as failed
+        once it has been attempted `max_attempts` times.
+        """
+
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = CASE WHEN attempts >= ? '
+                "THEN 'failed' ELSE 'pending' END, "
+                'lease_expires = NULL, error = ? WHERE id = ? AND worker = ?',
+                (self.max_attempts, str(error), job_id, worker))
+
+    def counts(self):
+        """Returns the number of jobs by status."""
+
+        with self._transaction() as conn:
+            return dict(conn.execute(
+                'SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+
+    def is_finished(self):
+        """Returns whether every job is either done or failed."""
+
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('leased')
+
+    def _transaction(self):
+
+        # A new connection per transaction, so that the queue can be used
+        #   from several threads.
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        return _Transaction(conn)
+
+
+class _Transaction:
+    """Context manager that holds a write lock on the database (so that two
+    workers can never lease the same job), commits on success, and closes
+    the connection.
+    """
+
+    def __init__(self, conn):
+
+        self.conn = conn
+
+    def __enter__(self):
+
+        try:
+            self.conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        self.conn.close()
+
+
+def run_worker(queue, email, worker=None, poll_seconds=30, download_kwargs=None,
+        **init_kwargs):
+    """Logs into FormSG, then downloads the forms leased from `queue` until
+    every job in the queue is finished.
+
+    Args:
+        queue (WorkQueue): The queue to take jobs from.
+        email (str): The email address to log into FormSG with.
+        worker (str): The name of this worker. Defaults to the host name and
+            process ID.
+        poll_seconds (float): How long to wait before checking the queue
+            again when all remaining jobs are leased to other workers.
+        download_kwargs (dict): Passed to `formsg_driver.download_csv()`,
+            e.g., `shards` and `start_date`.
+        **init_kwargs (various): Passed to `formsg_driver._init()`, e.g.,
+            `download_dir`.
+    """
+
+    from formsgdownloader import formsg_driver
+
+    worker = worker or f'{socket.gethostname()}-{os.getpid()}'
+    formsg_driver._init(**init_kwargs)
+    formsg_driver.login(email)
+    # Fail instead of waiting for an answer that never comes
+    formsg_driver.INTERACTIVE = False
+
+    while True:
+        job = queue.lease(worker)
+        if job is None:
+            if queue.is_finished():
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        if job.attempts > 1:
+            formsg_driver.METRICS.inc('retries_total', step='download')
+        formsg_driver._set_forms_details([(job.form_name, job.form_id, job.secret_key)])
+        formsg_driver.ABORT.clear()
+        with _LeaseKeeper(queue, job.id, worker, formsg_driver.ABORT) as keeper:
+            try:
+                formsg_driver.download_csv(job.form_name, **(download_kwargs or {}))
+            except Exception as e:
+                print(f'[!] Error downloading data from form: {job.form_name}.')
+                print(e)
+                queue.fail(job.id, worker, e)
+            else:
+                if keeper.lost:
+                    print(f'[!] Lost the lease on form: {job.form_name}.')
+                else:
+                    queue.ack(job.id, worker)
+        formsg_driver.ABORT.clear()
+
+    print('[*] Download finished!')
+    # One metrics file per worker, as workers may share the metrics folder
+    formsg_driver.write_metrics(file_name='{}_{}'.format(
+        metrics.FILE_NAME, re.sub(r'[^\w.-]', '_', worker)))
+    formsg_driver.close()
+
+
+class _LeaseKeeper:
+    """Context manager that renews the lease on a job in the background, so
+    that long downloads are not handed out to another worker. If the lease is
+    lost (e.g., it expired while the worker was suspended), sets `abort` to
+    stop the download.
+    """
+
+    def __init__(self, queue, job_id, worker, abort):
+
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.abort = abort
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._renew, daemon=True)
+
+    def __enter__(self):
+
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stopped.set()
+        self.thread.join()
+
+    def _renew(self):
+
+        interval = self.queue.lease_seconds / 3
+        while not self.stopped.wait(interval):
+            try:
+                renewed = self.queue.renew(self.job_id, self.worker)
+            except sqlite3.Error as e: # E.g., "database is locked" on a network share
+                print(f'[!] Failed to renew the lease on job {self.job_id}, '
+                      f'retrying: {e}')
+                interval = min(RENEW_RETRY_SECONDS, self.queue.lease_seconds / 3)
+                continue
+
+            if not renewed:
+                self.lost = True
+                self.abort.set()
+                return
+            interval = self.queue.lease_seconds / 3
+
+
+def _parse_args(args=None):
+
+    parser = argparse.ArgumentParser(
+        description='Distributes FormSG form downloads across workers.')
+    parser.add_argument('--queue', required=True,
+        help='Path to the queue database (on a shared volume)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator',
+        help='Add forms to the queue')
+    coordinator_parser.add_argument('--forms', required=True,
+        help='Session file (.formsg) or credentials file (.csv)')
+
+    worker_parser = subparsers.add_parser('worker',
+        help='Download forms from the queue')
+    worker_parser.add_argument('--email', required=True)
+    worker_parser.add_argument('--name',
+        help='Name of this worker, also used to name its metrics file '
+             '(default: host name and process ID)')
+    worker_parser.add_argument('--download-dir', help='Folder to save the data to')
+    worker_parser.add_argument('--chrome-driver', help='Path to the Chrome Driver')
+    worker_parser.add_argument('--store-dir',
+        help='Folder to keep a single copy of each distinct export in')
+    worker_parser.add_argument('--metrics-dir',
+        help='Folder to write the run metrics to')
+    worker_parser.add_argument('--lease-seconds', type=float,
+        default=DEFAULT_LEASE_SECONDS)
+    cli_utils.add_shard_arguments(worker_parser)
+
+    subparsers.add_parser('status', help='Show the number of jobs by status')
+
+    args = parser.parse_args(args)
+    if args.command == 'worker':
+        cli_utils.check_shard_arguments(worker_parser, args)
+    return args
+
+
+if __name__ == '__main__':
+
+    args = _parse_args()
+    if args.command == 'coordinator':
+        queue = WorkQueue(args.queue)
+        added = queue.enqueue(cli_utils.read_forms_file(args.forms))
+        print(f'[*] Added {added} form(s) to the queue at: {args.queue}')
+    elif args.command == 'worker':
+        queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+        run_worker(queue, args.email, worker=args.name,
+            download_kwargs={'shards': args.shards,
+                             'start_date': args.start_date,
+                             'end_date': args.end_date},
+            download_dir=args.download_dir, binary_path=args.chrome_driver,
+            store_dir=args.store_dir, metrics_dir=args.metrics_dir)
+    else:
+        for status, count in sorted(WorkQueue(args.queue).counts().items()):
+            print(f'{status}: {count}')
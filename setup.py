@@ -20,6 +20,10 @@ setuptools.setup(
     install_requires=[
         'selenium',
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+        'benchmarks': ['pynacl'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
@@ -0,0 +1,55 @@
+import argparse
+import datetime as dt
+import json
+
+import pytest
+
+from formsgdownloader import cli_utils
+
+
+FORMS = [('form1', 'id1', 'key1'), ('form2', 'id2', 'key2')]
+
+
+def test_read_credentials_file(tmp_path):
+
+    file_path = tmp_path / 'forms.csv'
+    file_path.write_text('form1,id1,key1\n\nform2,id2,key2\n', encoding='utf-8')
+
+    assert cli_utils.read_forms_file(str(file_path)) == FORMS
+
+
+def test_read_session_file(tmp_path):
+
+    file_path = tmp_path / 'session.formsg'
+    file_path.write_text(json.dumps({'forms': FORMS, 'email': ''}), encoding='utf-8')
+
+    assert cli_utils.read_forms_file(str(file_path)) == FORMS
+
+
+def _parse(args):
+
+    parser = argparse.ArgumentParser()
+    cli_utils.add_shard_arguments(parser)
+    parsed = parser.parse_args(args)
+    cli_utils.check_shard_arguments(parser, parsed)
+    return parsed
+
+
+def test_shard_arguments():
+
+    args = _parse(['--shards', '4', '--start-date', '2021-01-01'])
+
+    assert args.shards == 4
+    assert args.start_date == dt.date(2021, 1, 1)
+    assert args.end_date is None
+
+
+@pytest.mark.parametrize('args', [
+    ['--shards', '0'],
+    ['--shards', '2'],
+    ['--start-date', '01/01/2021'],
+])
+def test_invalid_shard_arguments(args):
+
+    with pytest.raises(SystemExit):
+        _parse(args)
@@ -0,0 +1,95 @@
+import gzip
+import os
+
+import pytest
+
+from formsgdownloader import compression
+
+
+CONTENT = b'"Response ID","Timestamp"\n' * 1000
+
+
+def _write(tmp_path, file_name='export.csv'):
+
+    file_path = tmp_path / file_name
+    file_path.write_bytes(CONTENT)
+    return str(file_path)
+
+
+def test_gzip_output_is_deterministic(tmp_path):
+
+    first = compression.compress_file(_write(tmp_path, 'first.csv'), 'gzip')
+    second = compression.compress_file(_write(tmp_path, 'second.csv'), 'gzip')
+
+    assert first.endswith('first.csv.gz')
+    assert not os.path.exists(first[:-len('.gz')])
+    with open(first, 'rb') as first_file, open(second, 'rb') as second_file:
+        compressed = first_file.read()
+        assert second_file.read() == compressed
+    assert gzip.decompress(compressed) == CONTENT
+
+
+@pytest.mark.parametrize('codec', compression.available_codecs())
+def test_round_trip(tmp_path, codec):
+
+    file_path = _write(tmp_path)
+
+    compressed_path = compression.compress_file(file_path, codec,
+        remove_source=False)
+
+    assert os.path.exists(file_path)
+    assert compression.get_codec(compressed_path) == codec
+    with compression.open_export(compressed_path, 'rb') as in_file:
+        assert in_file.read() == CONTENT
+
+
+def test_zstd_round_trip(tmp_path):
+
+    pytest.importorskip('zstandard')
+    compressed_path = compression.compress_file(_write(tmp_path), 'zstd')
+
+    with compression.open_export(compressed_path, 'rb') as in_file:
+        assert in_file.read() == CONTENT
+
+
+def test_open_uncompressed_export(tmp_path):
+
+    with compression.open_export(_write(tmp_path), 'rb') as in_file:
+        assert in_file.read() == CONTENT
+
+
+@pytest.mark.parametrize('codec, level', [
+    ('bzip2', None),
+    ('gzip', -1),
+    ('gzip', 12),
+    ('zstd', 0),
+    ('zstd', 23),
+])
+def test_check_codec_rejects_invalid_codec_and_level(codec, level):
+
+    with pytest.raises((ValueError, ImportError)):
+        compression.check_codec(codec, level)
+
+
+def test_invalid_level_leaves_no_files_behind(tmp_path):
+
+    file_path = _write(tmp_path)
+
+    with pytest.raises(ValueError):
+        compression.compress_file(file_path, 'gzip', level=12)
+
+    assert os.listdir(str(tmp_path)) == ['export.csv']
+
+
+def test_failed_compression_removes_temporary_file(tmp_path, monkeypatch):
+
+    def copyfileobj(*args):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(compression.shutil, 'copyfileobj', copyfileobj)
+    file_path = _write(tmp_path)
+
+    with pytest.raises(OSError):
+        compression.compress_file(file_path, 'gzip')
+
+    assert os.listdir(str(tmp_path)) == ['export.csv']
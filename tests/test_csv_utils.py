@@ -0,0 +1,108 @@
+import datetime as dt
+
+import pytest
+
+from formsgdownloader import csv_utils, verify
+
+
+HEADER = [csv_utils.RESPONSE_ID_COLUMN, csv_utils.TIMESTAMP_COLUMN, 'Name']
+
+
+def _write_export(file_path, rows, expected_count=None):
+
+    if expected_count is None:
+        expected_count = len(rows)
+    preamble = [[csv_utils.EXPECTED_COUNT_PREAMBLE_KEY, str(expected_count)], []]
+    csv_utils.write_export(str(file_path), preamble, HEADER, rows)
+    return str(file_path)
+
+
+def test_merge_exports_sorts_and_removes_duplicates(tmp_path):
+
+    first = _write_export(tmp_path / 'first.csv', [
+        ['b', '02 Jan 2021, 09:00:00 am', 'Bob'],
+        ['a', '01 Jan 2021, 11:00:00 pm', 'Alice'],
+    ])
+    second = _write_export(tmp_path / 'second.csv', [
+        ['c', '03 Jan 2021, 12:00:00 pm', 'Carol'],
+        ['b', '02 Jan 2021, 09:00:00 am', 'Bob'],
+    ])
+    out_path = str(tmp_path / 'merged.csv')
+
+    count = csv_utils.merge_exports([first, second], out_path)
+
+    preamble, header, rows = csv_utils.read_export(out_path)
+    assert count == 3
+    assert header == HEADER
+    assert [row[0] for row in rows] == ['a', 'b', 'c']
+    assert [csv_utils.EXPECTED_COUNT_PREAMBLE_KEY, '3'] in preamble
+    assert verify.verify_export(out_path).ok
+
+
+def test_merge_exports_keeps_missing_responses_detectable(tmp_path):
+
+    first = _write_export(tmp_path / 'first.csv', [
+        ['a', '01 Jan 2021, 10:00:00 am', 'Alice'],
+        ['b', '01 Jan 2021, 11:00:00 am', 'Bob'],
+    ], expected_count=3)
+    second = _write_export(tmp_path / 'second.csv', [
+        ['c', '02 Jan 2021, 10:00:00 am', 'Carol'],
+    ])
+    out_path = str(tmp_path / 'merged.csv')
+
+    assert csv_utils.merge_exports([first, second], out_path) == 3
+
+    result = verify.verify_export(out_path)
+    assert not result.ok
+    assert result.problems == ['Found 3 responses, but the preamble shows 4']
+
+
+def test_merge_exports_without_expected_count(tmp_path):
+
+    first = str(tmp_path / 'first.csv')
+    csv_utils.write_export(first, [], HEADER,
+        [['a', '01 Jan 2021, 10:00:00 am', 'Alice']])
+    out_path = str(tmp_path / 'merged.csv')
+
+    assert csv_utils.merge_exports([first], out_path) == 1
+    assert verify.verify_export(out_path).ok
+
+
+def test_merge_exports_keeps_quoted_newlines(tmp_path):
+
+    first = _write_export(tmp_path / 'first.csv', [
+        ['a', '01 Jan 2021, 10:00:00 am', 'Line 1\nLine 2'],
+    ])
+    out_path = str(tmp_path / 'merged.csv')
+
+    csv_utils.merge_exports([first], out_path)
+
+    _, _, rows = csv_utils.read_export(out_path)
+    assert rows == [['a', '01 Jan 2021, 10:00:00 am', 'Line 1\nLine 2']]
+
+
+def test_merge_exports_rejects_different_headers(tmp_path):
+
+    first = _write_export(tmp_path / 'first.csv', [])
+    second = str(tmp_path / 'second.csv')
+    csv_utils.write_export(second, [], HEADER + ['Age'], [])
+    out_path = str(tmp_path / 'merged.csv')
+
+    with pytest.raises(ValueError):
+        csv_utils.merge_exports([first, second], out_path)
+    assert not (tmp_path / 'merged.csv.rows').exists()
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('01 Jan 2021, 12:05:09 am', dt.datetime(2021, 1, 1, 0, 5, 9)),
+    ('01 Jan 2021, 12:05:09 pm', dt.datetime(2021, 1, 1, 12, 5, 9)),
+    ('31 Dec 2021 11:59:59 PM', dt.datetime(2021, 12, 31, 23, 59, 59)),
+    ('2021-01-01T10:00:00.000Z', dt.datetime(2021, 1, 1, 10, 0, 0)),
+    ('2021-01-01 10:00:00', dt.datetime(2021, 1, 1, 10, 0, 0)),
+    ('01 Jan 2021, 10:00:00 xm', None),
+    ('Not a timestamp', None),
+    ('', None),
+])
+def test_parse_timestamp(value, expected):
+
+    assert csv_utils.parse_timestamp(value) == expected
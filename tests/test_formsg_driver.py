@@ -0,0 +1,304 @@
+import base64
+import datetime as dt
+import json
+import os
+import threading
+
+import pytest
+from selenium.common.exceptions import (StaleElementReferenceException,
+    TimeoutException)
+
+from formsgdownloader import formsg_driver
+
+
+def test_split_date_range_covers_range_without_gaps():
+
+    start, end = dt.date(2021, 1, 1), dt.date(2021, 1, 10)
+
+    date_ranges = formsg_driver._split_date_range(start, end, 3)
+
+    assert date_ranges == [
+        (dt.date(2021, 1, 1), dt.date(2021, 1, 3)),
+        (dt.date(2021, 1, 4), dt.date(2021, 1, 6)),
+        (dt.date(2021, 1, 7), dt.date(2021, 1, 10)),
+    ]
+
+
+def test_split_date_range_has_at_most_one_shard_per_day():
+
+    start, end = dt.date(2021, 1, 1), dt.date(2021, 1, 2)
+
+    date_ranges = formsg_driver._split_date_range(start, end, 5)
+
+    assert date_ranges == [(start, start), (end, end)]
+
+
+def test_split_date_range_rejects_reversed_range():
+
+    with pytest.raises(ValueError):
+        formsg_driver._split_date_range(dt.date(2021, 1, 2), dt.date(2021, 1, 1), 2)
+
+
+VALID_FORM_ID = '0123456789abcdef01234567'
+VALID_SECRET_KEY = base64.b64encode(bytes(32)).decode('ascii')
+
+
+@pytest.mark.parametrize('form_id, secret_key, ok', [
+    (VALID_FORM_ID, VALID_SECRET_KEY, True),
+    ('0123456789abcdef', VALID_SECRET_KEY, False),
+    ('0123456789abcdef0123456g', VALID_SECRET_KEY, False),
+    (VALID_FORM_ID, VALID_SECRET_KEY[:-4], False),
+    (VALID_FORM_ID, '!' * 44, False),
+    (VALID_FORM_ID, 'é' * 44, False),
+])
+def test_check_form_details(monkeypatch, form_id, secret_key, ok):
+
+    monkeypatch.setattr(formsg_driver, 'FORMS', {})
+    formsg_driver._set_forms_details([('form', form_id, secret_key)])
+
+    result = formsg_driver._check_form_details('form')
+
+    assert result.form_code == 'form'
+    assert result.ok == ok
+    assert bool(result.details) != ok
+
+
+def test_check_form_details_unknown_form(monkeypatch):
+
+    monkeypatch.setattr(formsg_driver, 'FORMS', {})
+
+    assert not formsg_driver._check_form_details('form').ok
+
+
+class FakeTime:
+    """Stands in for the `time` module, advancing the clock on each sleep and
+    calling `on_sleep` (e.g., to simulate a download making progress).
+    """
+
+    def __init__(self, on_sleep=None):
+
+        self.now = 0
+        self.on_sleep = on_sleep
+
+    def monotonic(self):
+
+        return self.now
+
+    def sleep(self, seconds):
+
+        self.now += seconds
+        if self.on_sleep:
+            self.on_sleep(self.now)
+
+
+class FakeElement:
+
+    def __init__(self, text='', displayed=True):
+
+        self.text = text
+        self.displayed = displayed
+
+    def is_displayed(self):
+
+        return self.displayed
+
+
+class FakeDriver:
+    """Shows the "Export" button (i.e., the export is done) once `done_at`
+    seconds have passed, and raises `StaleElementReferenceException` at the
+    times in `stale_at`.
+    """
+
+    def __init__(self, clock, done_at=None, stale_at=(), button_text=lambda now: 'Exporting'):
+
+        self.clock = clock
+        self.done_at = done_at
+        self.stale_at = set(stale_at)
+        self.button_text = button_text
+
+    def find_elements(self, by, xpath):
+
+        if self.clock.now in self.stale_at:
+            raise StaleElementReferenceException()
+        if xpath.endswith('[.="Export"]'):
+            done = self.done_at is not None and self.clock.now >= self.done_at
+            return [FakeElement('Export')] if done else []
+        return [FakeElement(self.button_text(self.clock.now))]
+
+
+@pytest.fixture
+def download_dir(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(formsg_driver, 'DOWNLOAD_DIR', str(tmp_path))
+    monkeypatch.setattr(formsg_driver, 'ABORT', threading.Event())
+    return tmp_path
+
+
+def _wait(monkeypatch, driver, clock, timeout=100, stall_seconds=10):
+
+    monkeypatch.setattr(formsg_driver, 'D', driver, raising=False)
+    monkeypatch.setattr(formsg_driver, 'time', clock)
+    formsg_driver._wait_for_export(set(), timeout, stall_seconds)
+
+
+def test_wait_for_export_returns_when_done(download_dir, monkeypatch):
+
+    clock = FakeTime()
+
+    _wait(monkeypatch, FakeDriver(clock, done_at=5), clock)
+
+    assert clock.now == 5
+
+
+def test_no_stall_before_download_starts(download_dir, monkeypatch):
+
+    # FormSG decrypts the responses for a long time before downloading
+    clock = FakeTime()
+
+    _wait(monkeypatch, FakeDriver(clock, done_at=50), clock)
+
+    assert clock.now == 50
+
+
+def test_timeout_before_download_starts(download_dir, monkeypatch):
+
+    clock = FakeTime()
+
+    with pytest.raises(TimeoutException, match='did not finish'):
+        _wait(monkeypatch, FakeDriver(clock), clock)
+
+    assert clock.now == 101
+
+
+def test_stall_once_download_starts(download_dir, monkeypatch):
+
+    def on_sleep(now):
+        if now == 20:
+            (download_dir / 'export.csv.crdownload').write_bytes(b'x')
+
+    clock = FakeTime(on_sleep)
+
+    with pytest.raises(TimeoutException, match='no progress'):
+        _wait(monkeypatch, FakeDriver(clock), clock)
+
+    assert clock.now == 31
+
+
+def test_growing_download_does_not_stall(download_dir, monkeypatch):
+
+    def on_sleep(now):
+        with open(str(download_dir / 'export.csv.crdownload'), 'ab') as out_file:
+            out_file.write(b'x')
+
+    clock = FakeTime(on_sleep)
+
+    _wait(monkeypatch, FakeDriver(clock, done_at=60), clock)
+
+    assert clock.now == 60
+
+
+def test_changing_button_text_is_progress(download_dir, monkeypatch):
+
+    (download_dir / 'export.csv.crdownload').write_bytes(b'x')
+    clock = FakeTime()
+    driver = FakeDriver(clock, done_at=60, button_text=lambda now: f'{now // 5 * 5}%')
+
+    _wait(monkeypatch, driver, clock)
+
+    assert clock.now == 60
+
+
+def test_stale_elements_are_no_change(download_dir, monkeypatch):
+
+    (download_dir / 'export.csv.crdownload').write_bytes(b'x')
+    clock = FakeTime()
+    driver = FakeDriver(clock, stale_at=range(3, 100, 3))
+
+    with pytest.raises(TimeoutException, match='no progress'):
+        _wait(monkeypatch, driver, clock)
+
+    assert clock.now == 11
+
+
+def test_abort(download_dir, monkeypatch):
+
+    clock = FakeTime(lambda now: formsg_driver.ABORT.set() if now == 3 else None)
+
+    with pytest.raises(formsg_driver.DownloadAborted):
+        _wait(monkeypatch, FakeDriver(clock), clock)
+
+
+@pytest.fixture
+def throughput(monkeypatch):
+
+    throughput = {}
+    monkeypatch.setattr(formsg_driver, 'THROUGHPUT', throughput)
+    monkeypatch.setattr(formsg_driver, 'THROUGHPUT_PATH', None)
+    return throughput
+
+
+@pytest.mark.parametrize('stored, response_count, num_exports, expected', [
+    ({}, None, 1, formsg_driver.EXPORT_TIMEOUT_SECONDS),
+    ({}, 10000, 1, 3 * 10000 / formsg_driver.DEFAULT_THROUGHPUT),
+    ({'*': 100}, 10000, 1, 300),
+    ({'*': 100, 'form': 50}, 10000, 1, 600),
+    ({'form': 50}, 10000, 4, 150),
+    ({'form': 50}, 10, 1, formsg_driver.MIN_EXPORT_TIMEOUT_SECONDS),
+    ({'form': 1}, 10 ** 6, 1, formsg_driver.MAX_EXPORT_TIMEOUT_SECONDS),
+])
+def test_get_export_timeout(throughput, stored, response_count, num_exports, expected):
+
+    throughput.update(stored)
+
+    assert formsg_driver._get_export_timeout('form', response_count, num_exports) \
+        == pytest.approx(expected)
+
+
+def test_record_throughput_moving_average(throughput):
+
+    formsg_driver._record_throughput('form', 1000, 10)
+    assert throughput == {'form': 100, '*': 100}
+
+    formsg_driver._record_throughput('other', 2000, 10)
+    formsg_driver._record_throughput('form', 2000, 10, weight=0.5)
+    assert throughput['form'] == pytest.approx(150)
+    assert throughput['other'] == pytest.approx(200)
+    assert throughput['*'] == pytest.approx(0.5 * (0.7 * 100 + 0.3 * 200) + 0.5 * 200)
+
+
+@pytest.mark.parametrize('responses, seconds', [(0, 10), (None, 10), (100, 0)])
+def test_record_throughput_ignores_empty_exports(throughput, responses, seconds):
+
+    formsg_driver._record_throughput('form', responses, seconds)
+
+    assert throughput == {}
+
+
+def test_throughput_is_saved_and_loaded(throughput, tmp_path, monkeypatch):
+
+    file_path = str(tmp_path / 'throughput.json')
+    formsg_driver._load_throughput(file_path)
+    assert formsg_driver.THROUGHPUT == {}
+
+    formsg_driver._record_throughput('form', 1000, 10)
+    with open(file_path, 'rt', encoding='utf-8') as in_file:
+        assert json.load(in_file) == {'form': 100, '*': 100}
+    assert not os.path.exists(file_path + '.tmp')
+
+    monkeypatch.setattr(formsg_driver, 'THROUGHPUT', {})
+    formsg_driver._load_throughput(file_path)
+    assert formsg_driver.THROUGHPUT == {'form': 100, '*': 100}
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1 response', 1),
+    ('1,234 responses', 1234),
+    ('0 responses', 0),
+    ('No responses yet', None),
+])
+def test_get_response_count(monkeypatch, text, expected):
+
+    monkeypatch.setattr(formsg_driver, '_wait_for_element',
+        lambda xpath, seconds: FakeElement(text))
+
+    assert formsg_driver._get_response_count() == expected
@@ -0,0 +1,81 @@
+import json
+import math
+import os
+
+import pytest
+
+from formsgdownloader.metrics import Metrics
+
+
+@pytest.fixture
+def metrics():
+
+    metrics = Metrics()
+    metrics.inc('failures_total', step='export')
+    metrics.inc('failures_total', 2, step='export')
+    metrics.inc('failures_total', step='verify')
+    metrics.set('run_seconds', 12.5)
+    metrics.observe('form_download_seconds', 3, buckets=(1, 5, math.inf), form='a')
+    metrics.observe('form_download_seconds', 7, buckets=(1, 5, math.inf), form='a')
+    return metrics
+
+
+def test_to_prometheus(metrics):
+
+    assert metrics.to_prometheus().splitlines() == [
+        '# TYPE formsg_failures_total counter',
+        'formsg_failures_total{step="export"} 3',
+        'formsg_failures_total{step="verify"} 1',
+        '# TYPE formsg_run_seconds gauge',
+        'formsg_run_seconds 12.5',
+        '# TYPE formsg_form_download_seconds histogram',
+        'formsg_form_download_seconds_bucket{form="a",le="1.0"} 0',
+        'formsg_form_download_seconds_bucket{form="a",le="5.0"} 1',
+        'formsg_form_download_seconds_bucket{form="a",le="+Inf"} 2',
+        'formsg_form_download_seconds_sum{form="a"} 10',
+        'formsg_form_download_seconds_count{form="a"} 2',
+    ]
+
+
+def test_to_prometheus_escapes_labels():
+
+    metrics = Metrics()
+    metrics.inc('failures_total', form='say "hi"\\\n')
+
+    assert 'formsg_failures_total{form="say \\"hi\\"\\\\\\n"} 1' \
+        in metrics.to_prometheus().splitlines()
+
+
+def test_to_json(metrics):
+
+    data = json.loads(json.dumps(metrics.to_json()))
+
+    assert data['counters'] == [
+        {'name': 'formsg_failures_total', 'labels': {'step': 'export'}, 'value': 3},
+        {'name': 'formsg_failures_total', 'labels': {'step': 'verify'}, 'value': 1},
+    ]
+    assert data['gauges'] == [
+        {'name': 'formsg_run_seconds', 'labels': {}, 'value': 12.5}]
+    assert data['histograms'] == [
+        {'name': 'formsg_form_download_seconds', 'labels': {'form': 'a'},
+         'value': {'buckets': {'1': 0, '5': 1, '+Inf': 2}, 'sum': 10, 'count': 2}}]
+
+
+def test_timer_records_failures(metrics):
+
+    with pytest.raises(ValueError):
+        with metrics.timer('login_seconds'):
+            raise ValueError()
+
+    assert metrics.to_json()['histograms'][-1]['value']['count'] == 1
+
+
+def test_write(metrics, tmp_path):
+
+    prom_path, json_path = metrics.write(str(tmp_path), 'worker1')
+
+    assert sorted(os.listdir(str(tmp_path))) == ['worker1.json', 'worker1.prom']
+    with open(prom_path, 'rt', encoding='utf-8') as in_file:
+        assert in_file.read() == metrics.to_prometheus()
+    with open(json_path, 'rt', encoding='utf-8') as in_file:
+        assert json.load(in_file) == json.loads(json.dumps(metrics.to_json()))
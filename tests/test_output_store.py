@@ -0,0 +1,45 @@
+import os
+
+from formsgdownloader import output_store
+
+
+def _write_run(run_dir, file_name, content):
+
+    os.makedirs(run_dir, exist_ok=True)
+    file_path = os.path.join(run_dir, file_name)
+    with open(file_path, 'wt', encoding='utf-8') as out_file:
+        out_file.write(content)
+    return file_path
+
+
+def test_store_export_keeps_one_read_only_copy(tmp_path):
+
+    store_dir = str(tmp_path / 'store')
+    first = _write_run(str(tmp_path / 'run1'), 'form.csv', 'same')
+    second = _write_run(str(tmp_path / 'run2'), 'form.csv', 'same')
+
+    digest = output_store.store_export(first, store_dir, 'form')
+    assert output_store.store_export(second, store_dir, 'form') == digest
+
+    stored_path = os.path.join(store_dir, digest[:2], digest + '.csv')
+    assert os.listdir(os.path.join(store_dir, digest[:2])) == [digest + '.csv']
+    assert os.stat(stored_path).st_mode & 0o777 == output_store.READ_ONLY
+    for file_path in (first, second):
+        with open(file_path, 'rt', encoding='utf-8') as in_file:
+            assert in_file.read() == 'same'
+    assert output_store.read_manifest(str(tmp_path / 'run1')) == {
+        'form': {'file': 'form.csv', 'sha256': digest}}
+
+
+def test_diff_runs(tmp_path):
+
+    store_dir = str(tmp_path / 'store')
+    run1, run2 = str(tmp_path / 'run1'), str(tmp_path / 'run2')
+    for run_dir, contents in ((run1, {'same': 'a', 'changed': 'b', 'removed': 'c'}),
+                              (run2, {'same': 'a', 'changed': 'B', 'added': 'd'})):
+        for form_code, content in contents.items():
+            file_path = _write_run(run_dir, form_code + '.csv', content)
+            output_store.store_export(file_path, store_dir, form_code)
+
+    assert output_store.diff_runs(run1, run2) == ['added', 'changed', 'removed']
+    assert output_store.diff_runs(run1, run1) == []
@@ -0,0 +1,86 @@
+import datetime as dt
+
+import pytest
+
+from formsgdownloader import compression, csv_utils
+from formsgdownloader.reader import ExportReader, iter_responses
+
+
+HEADER = ['Response ID', 'Timestamp', 'Name', 'Pets', 'Meals']
+ROWS = [
+    ['a', '01 Jan 2021, 10:00:00 pm', 'Alice', 'Cat;Dog', 'Mon,Rice;Tue,Noodles'],
+    ['b', 'Not a timestamp', 'Bob', '', ''],
+]
+
+
+@pytest.fixture
+def export_path(tmp_path):
+
+    file_path = str(tmp_path / 'export.csv')
+    csv_utils.write_export(file_path,
+        [[csv_utils.EXPECTED_COUNT_PREAMBLE_KEY, '2'], []], HEADER, ROWS)
+    return file_path
+
+
+def test_reads_all_columns(export_path):
+
+    with ExportReader(export_path) as reader:
+        responses = list(reader)
+
+    assert reader.preamble == [[csv_utils.EXPECTED_COUNT_PREAMBLE_KEY, '2'], []]
+    assert reader.header == HEADER
+    assert responses[0] == {
+        'Response ID': 'a',
+        'Timestamp': dt.datetime(2021, 1, 1, 22, 0, 0),
+        'Name': 'Alice',
+        'Pets': 'Cat;Dog',
+        'Meals': 'Mon,Rice;Tue,Noodles',
+    }
+
+
+def test_keeps_unparseable_timestamps(export_path):
+
+    responses = list(iter_responses(export_path, columns=['Timestamp']))
+
+    assert responses[1] == {'Timestamp': 'Not a timestamp'}
+
+
+def test_projects_and_splits_columns(export_path):
+
+    responses = list(iter_responses(export_path, columns=['Name', 'Pets', 'Meals'],
+        list_columns=['Pets'], table_columns=['Meals']))
+
+    assert responses == [
+        {'Name': 'Alice', 'Pets': ['Cat', 'Dog'],
+         'Meals': [['Mon', 'Rice'], ['Tue', 'Noodles']]},
+        {'Name': 'Bob', 'Pets': [], 'Meals': []},
+    ]
+
+
+def test_single_column(export_path):
+
+    responses = list(iter_responses(export_path, columns=['Name']))
+
+    assert responses == [{'Name': 'Alice'}, {'Name': 'Bob'}]
+
+
+def test_unknown_column(export_path):
+
+    with pytest.raises(ValueError):
+        ExportReader(export_path, columns=['Age'])
+
+
+def test_reads_compressed_export(export_path):
+
+    compressed_path = compression.compress_file(export_path, 'gzip')
+
+    responses = list(iter_responses(compressed_path, columns=['Name'],
+        parse_timestamps=False))
+
+    assert responses == [{'Name': 'Alice'}, {'Name': 'Bob'}]
+
+
+def test_no_columns(export_path):
+
+    with pytest.raises(ValueError):
+        ExportReader(export_path, columns=[])
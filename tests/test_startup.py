@@ -0,0 +1,23 @@
+from benchmarks import bench_startup
+
+
+# Generous, so that slower machines pass (the import takes about 25 ms on a
+#   typical development machine, and importing formsg_driver about 250 ms)
+MAX_IMPORT_MS = 500
+
+
+def test_gui_does_not_import_selenium_at_startup():
+
+    _, imported = bench_startup.measure_import()
+
+    assert 'formsgdownloader.gui' in imported
+    for module in bench_startup.LAZY_MODULES:
+        assert module not in imported
+
+
+def test_gui_import_time():
+
+    # Best of a few runs, to ignore one-off delays (e.g., a cold disk cache)
+    import_ms = min(bench_startup.measure_import()[0] for _ in range(3))
+
+    assert import_ms < MAX_IMPORT_MS
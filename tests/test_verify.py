@@ -0,0 +1,85 @@
+import gzip
+
+import pytest
+
+from formsgdownloader import verify
+
+
+HEADER = b'"Response ID","Timestamp","Comments"'
+PREAMBLE = b'"Expected total responses","3"\n\n'
+ROWS = [
+    b'"a","01 Jan 2021, 10:00:00 am","Plain"',
+    b'"b","02 Jan 2021, 10:00:00 am","Two\nlines, and ""quotes"""',
+    b'"c","03 Jan 2021, 10:00:00 am",""""',
+]
+EXPORT = PREAMBLE + HEADER + b'\n' + b'\n'.join(ROWS) + b'\n'
+
+
+def _write(tmp_path, content, file_name='export.csv'):
+
+    file_path = tmp_path / file_name
+    file_path.write_bytes(content)
+    return str(file_path)
+
+
+def test_scan_ignores_quoted_newlines(tmp_path):
+
+    assert verify._scan(_write(tmp_path, EXPORT)) == (6, False)
+
+
+def test_scan_handles_crlf(tmp_path):
+
+    file_path = _write(tmp_path, EXPORT.replace(b'\n', b'\r\n'))
+
+    assert verify._scan(file_path) == (6, False)
+
+
+def test_scan_counts_last_record_without_newline(tmp_path):
+
+    assert verify._scan(_write(tmp_path, EXPORT[:-1])) == (6, False)
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_scan_across_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+
+    monkeypatch.setattr(verify, 'CHUNK_SIZE', chunk_size)
+
+    assert verify._scan(_write(tmp_path, EXPORT)) == (6, False)
+
+
+def test_scan_detects_truncation_inside_quotes(tmp_path):
+
+    truncated = EXPORT[:EXPORT.index(b'Two\n') + 4]
+
+    assert verify._scan(_write(tmp_path, truncated)) == (5, True)
+
+
+def test_scan_empty_file(tmp_path):
+
+    assert verify._scan(_write(tmp_path, b'')) == (0, False)
+
+
+def test_verify_export(tmp_path):
+
+    result = verify.verify_export(_write(tmp_path, EXPORT), 3,
+        ['Response ID', 'Timestamp', 'Comments'])
+
+    assert result.ok and result.responses == 3
+
+
+def test_verify_export_compressed(tmp_path):
+
+    file_path = _write(tmp_path, gzip.compress(EXPORT), 'export.csv.gz')
+
+    assert verify.verify_export(file_path, 3).ok
+
+
+def test_verify_export_reports_problems(tmp_path):
+
+    truncated = EXPORT[:EXPORT.index(b'Two\n') + 4]
+
+    result = verify.verify_export(_write(tmp_path, truncated), 3,
+        ['Response ID', 'Timestamp', 'Name'])
+
+    assert not result.ok
+    assert len(result.problems) == 4 # Truncated, header, Data tab, preamble
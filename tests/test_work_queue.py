@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from formsgdownloader import work_queue
+from formsgdownloader.work_queue import WorkQueue
+
+
+FORMS = [('form1', 'id1', 'key1'), ('form2', 'id2', 'key2')]
+
+
+def _make_queue(tmp_path, **kwargs):
+
+    queue = WorkQueue(str(tmp_path / 'queue.db'), **kwargs)
+    queue.enqueue(FORMS)
+    return queue
+
+
+def test_enqueue_skips_queued_forms(tmp_path):
+
+    queue = _make_queue(tmp_path)
+
+    assert queue.enqueue(FORMS[:1] + [('form3', 'id3', 'key3')]) == 1
+    assert queue.counts() == {'pending': 3}
+
+
+def test_lease_hands_out_each_job_once(tmp_path):
+
+    queue = _make_queue(tmp_path)
+
+    first = queue.lease('worker1')
+    second = queue.lease('worker2')
+
+    assert {first.form_name, second.form_name} == {'form1', 'form2'}
+    assert first.attempts == second.attempts == 1
+    assert queue.lease('worker3') is None
+    assert not queue.is_finished()
+
+    queue.ack(first.id, 'worker1')
+    queue.ack(second.id, 'worker2')
+    assert queue.counts() == {'done': 2}
+    assert queue.is_finished()
+
+
+def test_renew_fails_for_other_worker(tmp_path):
+
+    queue = _make_queue(tmp_path)
+    job = queue.lease('worker1')
+
+    assert queue.renew(job.id, 'worker1')
+    assert not queue.renew(job.id, 'worker2')
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.05)
+    queue.enqueue(FORMS[:1])
+    job = queue.lease('worker1')
+
+    time.sleep(0.1)
+    retried = queue.lease('worker2')
+
+    assert retried.id == job.id and retried.attempts == 2
+    assert not queue.renew(job.id, 'worker1')
+
+
+def test_expired_lease_fails_job_at_max_attempts(tmp_path):
+
+    queue = _make_queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    queue.lease('worker1')
+    queue.lease('worker1')
+
+    time.sleep(0.1)
+
+    assert queue.lease('worker2') is None
+    assert queue.counts() == {'failed': 2}
+    assert queue.is_finished()
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+
+    queue = WorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.enqueue(FORMS[:1])
+
+    job = queue.lease('worker1')
+    queue.fail(job.id, 'worker1', ValueError('First error'))
+    assert queue.counts() == {'pending': 1}
+
+    retried = queue.lease('worker1')
+    assert retried.id == job.id and retried.attempts == 2
+    queue.fail(job.id, 'worker1', ValueError('Second error'))
+    assert queue.counts() == {'failed': 1}
+    assert queue.is_finished()
+
+
+class _FlakyQueue:
+    """Fails to renew a lease a given number of times, then renews it."""
+
+    lease_seconds = 0.03
+
+    def __init__(self, failures, renewed=True):
+
+        self.failures = failures
+        self.renewed = renewed
+        self.calls = 0
+
+    def renew(self, job_id, worker):
+
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise sqlite3.OperationalError('database is locked')
+        return self.renewed
+
+
+def test_lease_keeper_retries_failed_renewals():
+
+    queue, abort = _FlakyQueue(failures=2), threading.Event()
+
+    with work_queue._LeaseKeeper(queue, 1, 'worker1', abort) as keeper:
+        time.sleep(0.2)
+
+    assert queue.calls > 3
+    assert not keeper.lost and not abort.is_set()
+
+
+def test_lease_keeper_aborts_when_lease_is_lost():
+
+    queue, abort = _FlakyQueue(failures=0, renewed=False), threading.Event()
+
+    with work_queue._LeaseKeeper(queue, 1, 'worker1', abort) as keeper:
+        assert abort.wait(1)
+
+    assert keeper.lost and queue.calls == 1
+
+
+def test_status_does_not_import_selenium(tmp_path):
+
+    code = ('import sys\n'
+            'from formsgdownloader import work_queue\n'
+            f'work_queue._parse_args(["--queue", {str(tmp_path / "q.db")!r}, "status"])\n'
+            'assert "selenium" not in sys.modules')
+
+    subprocess.run([sys.executable, '-c', code], check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))